@@ -1,9 +1,19 @@
 import os
+import base64
+import asyncio
+import functools
 import logging
+import sqlite3
+import threading
 import traceback
-from typing import List, Dict, Any, Optional, Union
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Union
 import time
+import numpy as np
 import openai
+import tiktoken
+from blake3 import blake3
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,12 +23,298 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 # Configure OpenAI API key
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
 # Use the embeddings model (change as needed)
 EMBEDDINGS_MODEL = "text-embedding-3-small"
 # Default dimensions for the embeddings model (1536 for most OpenAI models)
 EMBEDDING_DIMENSIONS = 1536
+# Maximum input length of the embeddings model, in tokens
+EMBEDDING_MAX_TOKENS = 8191
+# Maximum number of embedding requests in flight for the async helpers
+EMBEDDING_CONCURRENCY = 16
+# Inputs per embeddings request, and the API's limit on total tokens per request
+EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_BATCH_MAX_TOKENS = 300000
+# Maximum number of batch requests in flight for a single batch call
+EMBEDDING_BATCH_CONCURRENCY = 8
+
+# Local embedding cache location (empty disables the cache) and entry lifetime
+EMBED_CACHE_PATH = os.environ.get("EMBED_CACHE_PATH", "./.embedcache.sqlite3")
+EMBED_CACHE_TTL_SECONDS = 30 * 86400
+EMBED_CACHE_PURGE_INTERVAL_SECONDS = 86400
+
+# Shared clients, so every call reuses one HTTPS connection pool to the API.
+# SDK retries are disabled in favour of the backoff loops below.
+_client = openai.OpenAI(api_key=OPENAI_API_KEY, timeout=30, max_retries=0) if OPENAI_API_KEY else None
+_async_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=30, max_retries=0) if OPENAI_API_KEY else None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+  """Return the tokenizer of a model, loading it on first use; None if it can't be loaded."""
+  try:
+    return tiktoken.encoding_for_model(model)
+  except Exception as e:
+    logger.warning(f"Tokenizer for {model} unavailable, truncating by characters instead: {e}")
+    return None
+
+
+def _truncate(text: str, model: str) -> str:
+  """Truncate text to the model's input limit of EMBEDDING_MAX_TOKENS tokens."""
+  encoding = _get_encoding(model)
+  if encoding is None:
+    # Approximately 5000 tokens of English text
+    return text[:20000]
+
+  # Tokens average well under 8 characters, so a long article only needs its prefix encoded;
+  # fall back to the whole text if the prefix is short of the limit
+  prefix = text[: EMBEDDING_MAX_TOKENS * 8]
+  tokens = encoding.encode_ordinary(prefix)
+  if len(tokens) <= EMBEDDING_MAX_TOKENS and len(prefix) < len(text):
+    tokens = encoding.encode_ordinary(text)
+  if len(tokens) <= EMBEDDING_MAX_TOKENS:
+    return text
+  return encoding.decode(tokens[:EMBEDDING_MAX_TOKENS])
+
+
+def _num_tokens(text: str, model: str) -> int:
+  """Count the tokens of text, estimating 4 characters per token if the tokenizer is unavailable."""
+  encoding = _get_encoding(model)
+  if encoding is None:
+    return len(text) // 4 + 1
+  return len(encoding.encode_ordinary(text))
+
+
+def _length_sorted_batches(inputs: List[str], model: str) -> List[List[int]]:
+  """
+  Group input indices into API-sized batches of similar length.
+
+  Indices are sorted by input length before chunking, so each request holds inputs of
+  similar size and no batch is held up by a single long outlier.
+
+  Returns:
+      Batches of indices into inputs, each within EMBEDDING_BATCH_SIZE inputs and
+      EMBEDDING_BATCH_MAX_TOKENS tokens
+  """
+  batches = []
+  batch, batch_tokens = [], 0
+  for i in sorted(range(len(inputs)), key=lambda i: len(inputs[i])):
+    tokens = _num_tokens(inputs[i], model)
+    if batch and (len(batch) == EMBEDDING_BATCH_SIZE or batch_tokens + tokens > EMBEDDING_BATCH_MAX_TOKENS):
+      batches.append(batch)
+      batch, batch_tokens = [], 0
+    batch.append(i)
+    batch_tokens += tokens
+  if batch:
+    batches.append(batch)
+  return batches
+
+
+class EmbedCache:
+  """
+  Content-addressed local cache of embedding vectors.
+
+  Vectors are stored as float32 blobs in a SQLite file, keyed by the blake3 digest of the
+  model name and the exact input text, so identical inputs never hit the API twice.
+  Cache failures are logged and treated as misses.
+  """
+
+  def __init__(self, path: str, ttl_seconds: int = EMBED_CACHE_TTL_SECONDS):
+    """
+    Initialize the cache.
+
+    Args:
+        path: Path of the SQLite cache file; an empty path disables the cache
+        ttl_seconds: Age after which cached vectors are ignored
+    """
+    self.path = path
+    self.ttl_seconds = ttl_seconds
+    self._lock = threading.Lock()
+    self._conn = None
+    self._last_purge = 0.0
+
+    if not path:
+      return
+
+    try:
+      self._conn = sqlite3.connect(path, check_same_thread=False)
+      self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)")
+      self._purge_expired()
+      self._conn.commit()
+    except sqlite3.Error as e:
+      logger.warning(f"Embedding cache disabled, could not open {path}: {e}")
+      self._conn = None
+
+  def _purge_expired(self):
+    """Delete expired vectors, so the cache file doesn't grow without bound; the caller commits."""
+    self._last_purge = time.time()
+    self._conn.execute("DELETE FROM embeddings WHERE created_at < ?", (self._last_purge - self.ttl_seconds,))
+
+  @staticmethod
+  def key(text: str, model: str) -> str:
+    """Return the cache key for a model/text pair."""
+    return blake3(model.encode() + b"\0" + text.encode()).hexdigest()
+
+  def get_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+    """Look up cached vectors; missing or expired entries are None."""
+    results: List[Optional[List[float]]] = [None] * len(texts)
+    if self._conn is None or not texts:
+      return results
+
+    keys = [self.key(text, model) for text in texts]
+    min_created_at = time.time() - self.ttl_seconds
+    try:
+      with self._lock:
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+          f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND created_at >= ?", (*keys, min_created_at)
+        ).fetchall()
+    except sqlite3.Error as e:
+      logger.warning(f"Embedding cache lookup failed: {e}")
+      return results
+
+    found = {key: array("f", vector).tolist() for key, vector in rows}
+    return [found.get(key) for key in keys]
+
+  def set_many(self, texts: List[str], model: str, vectors: List[Optional[List[float]]]):
+    """Store vectors for texts, skipping failed (None) vectors."""
+    if self._conn is None:
+      return
+
+    now = time.time()
+    rows = [(self.key(text, model), array("f", vector).tobytes(), now) for text, vector in zip(texts, vectors) if vector]
+    if not rows:
+      return
+
+    try:
+      with self._lock:
+        self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)", rows)
+        # Long-running processes purge about once a day, not only when the cache is opened
+        if now - self._last_purge > EMBED_CACHE_PURGE_INTERVAL_SECONDS:
+          self._purge_expired()
+        self._conn.commit()
+    except sqlite3.Error as e:
+      logger.warning(f"Embedding cache write failed: {e}")
+
+  def get_or_compute(self, text: str, model: str, compute: Callable[[str], Optional[List[float]]]) -> Optional[List[float]]:
+    """Return the cached vector for text, computing and storing it on a miss."""
+    return self.get_or_compute_many([text], model, lambda misses: [compute(misses[0])])[0]
+
+  def get_or_compute_many(self, texts: List[str], model: str, compute: Callable[[List[str]], List[Optional[List[float]]]]) -> List[Optional[List[float]]]:
+    """Return vectors for texts; all misses are computed with a single call to compute."""
+    results = self.get_many(texts, model)
+    misses = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+    if not misses:
+      return results
+
+    computed = dict(zip(misses, compute(misses)))
+    self.set_many(misses, model, [computed[text] for text in misses])
+    return [vector if vector is not None else computed[text] for text, vector in zip(texts, results)]
+
+  async def aget_or_compute_many(
+    self, texts: List[str], model: str, compute: Callable[[List[str]], Awaitable[List[Optional[List[float]]]]]
+  ) -> List[Optional[List[float]]]:
+    """Async version of get_or_compute_many; the SQLite reads and writes run in worker threads."""
+    results = await asyncio.to_thread(self.get_many, texts, model)
+    misses = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+    if not misses:
+      return results
+
+    computed = dict(zip(misses, await compute(misses)))
+    await asyncio.to_thread(self.set_many, misses, model, [computed[text] for text in misses])
+    return [vector if vector is not None else computed[text] for text, vector in zip(texts, results)]
+
+
+cache = EmbedCache(EMBED_CACHE_PATH, ttl_seconds=EMBED_CACHE_TTL_SECONDS)
+
+
+def _decode_embedding(data: str) -> List[float]:
+  """Decode an embedding returned with encoding_format="base64" (little-endian float32)."""
+  return np.frombuffer(base64.b64decode(data), dtype="<f4").tolist()
+
+
+def _create_embeddings(inputs: List[str], model: str, max_retries: int) -> List[Optional[List[float]]]:
+  """Call the OpenAI API once for all inputs, retrying with exponential backoff."""
+  for attempt in range(max_retries):
+    try:
+      # base64 float32 payloads are ~4x smaller than JSON float arrays
+      response = _client.embeddings.create(model=model, input=inputs, encoding_format="base64")
+
+      # The API returns one embedding per input, in input order
+      embeddings = [_decode_embedding(item.embedding) for item in response.data]
+      logger.info(f"Successfully generated {len(embeddings)} embeddings of dimension {len(embeddings[0])}")
+      return embeddings
+
+    except Exception as e:
+      logger.warning(f"Attempt {attempt + 1}/{max_retries} failed to generate embeddings: {str(e)}")
+      if attempt < max_retries - 1:
+        # Exponential backoff
+        time.sleep(2**attempt)
+      else:
+        logger.error(f"Failed to generate embeddings after {max_retries} attempts:\n{traceback.format_exc()}")
+  return [None] * len(inputs)
+
+
+async def _acreate_embeddings(inputs: List[str], model: str, max_retries: int, client: openai.AsyncOpenAI) -> List[Optional[List[float]]]:
+  """Async version of _create_embeddings."""
+  for attempt in range(max_retries):
+    try:
+      response = await client.embeddings.create(model=model, input=inputs, encoding_format="base64")
+
+      embeddings = [_decode_embedding(item.embedding) for item in response.data]
+      logger.info(f"Successfully generated {len(embeddings)} embeddings of dimension {len(embeddings[0])}")
+      return embeddings
+
+    except Exception as e:
+      logger.warning(f"Attempt {attempt + 1}/{max_retries} failed to generate embeddings: {str(e)}")
+      if attempt < max_retries - 1:
+        # Exponential backoff, rate limits included
+        await asyncio.sleep(2**attempt)
+      else:
+        logger.error(f"Failed to generate embeddings after {max_retries} attempts:\n{traceback.format_exc()}")
+  return [None] * len(inputs)
+
+
+def _create_embeddings_batched(inputs: List[str], model: str, max_retries: int) -> List[Optional[List[float]]]:
+  """
+  Embed any number of inputs with one API call per length-sorted batch, returning vectors in input order.
+
+  Up to EMBEDDING_BATCH_CONCURRENCY batches are requested at once from worker threads, which
+  spend their time waiting on the network.
+  """
+  batches = _length_sorted_batches(inputs, model)
+
+  def embed_batch(batch: List[int]) -> List[Optional[List[float]]]:
+    return _create_embeddings([inputs[i] for i in batch], model, max_retries)
+
+  if len(batches) == 1:
+    batch_embeddings = [embed_batch(batches[0])]
+  else:
+    with ThreadPoolExecutor(max_workers=EMBEDDING_BATCH_CONCURRENCY) as executor:
+      batch_embeddings = list(executor.map(embed_batch, batches))
+
+  results: List[Optional[List[float]]] = [None] * len(inputs)
+  for batch, embeddings in zip(batches, batch_embeddings):
+    for i, embedding in zip(batch, embeddings):
+      results[i] = embedding
+  return results
+
+
+async def _acreate_embeddings_batched(inputs: List[str], model: str, max_retries: int, client: openai.AsyncOpenAI) -> List[Optional[List[float]]]:
+  """Async version of _create_embeddings_batched; up to EMBEDDING_BATCH_CONCURRENCY batches run concurrently."""
+  semaphore = asyncio.Semaphore(EMBEDDING_BATCH_CONCURRENCY)
+
+  async def embed_batch(batch: List[int]) -> List[Optional[List[float]]]:
+    async with semaphore:
+      return await _acreate_embeddings([inputs[i] for i in batch], model, max_retries, client)
+
+  batches = _length_sorted_batches(inputs, model)
+  results: List[Optional[List[float]]] = [None] * len(inputs)
+  for batch, embeddings in zip(batches, await asyncio.gather(*(embed_batch(batch) for batch in batches))):
+    for i, embedding in zip(batch, embeddings):
+      results[i] = embedding
+  return results
 
 
 def generate_embedding(text: str, model: str = EMBEDDINGS_MODEL, max_retries: int = 3) -> Optional[List[float]]:
@@ -37,37 +333,88 @@ def generate_embedding(text: str, model: str = EMBEDDINGS_MODEL, max_retries: in
     logger.warning("Empty text provided for embedding generation")
     return None
 
-  if not openai.api_key:
+  if _client is None:
     logger.error("OpenAI API key not found in environment variables")
     return None
 
-  # Limit text length to avoid token limits (typically ~8k tokens for embeddings models)
-  # Truncate to approximately 5000 tokens to be safe
-  text = text[:20000]
+  # Limit text length to the model's token limit
+  text = _truncate(text, model)
 
-  for attempt in range(max_retries):
-    try:
-      response = openai.embeddings.create(model=model, input=text)
+  return cache.get_or_compute(text, model, lambda t: _create_embeddings([t], model, max_retries)[0])
 
-      # Extract the embedding from the response
-      embedding = response.data[0].embedding
-      logger.info(f"Successfully generated embedding of dimension {len(embedding)}")
-      return embedding
 
-    except Exception as e:
-      logger.warning(f"Attempt {attempt + 1}/{max_retries} failed to generate embedding: {str(e)}")
-      if attempt < max_retries - 1:
-        # Exponential backoff
-        time.sleep(2**attempt)
-      else:
-        logger.error(f"Failed to generate embedding after {max_retries} attempts:\n{traceback.format_exc()}")
-        return None
+def generate_embeddings_batch(texts: List[str], model: str = EMBEDDINGS_MODEL, max_retries: int = 3) -> List[Optional[List[float]]]:
+  """
+  Generate embeddings for several texts, batching them into as few OpenAI API calls as possible.
+
+  Args:
+      texts: The texts to generate embeddings for
+      model: The OpenAI model to use
+      max_retries: Maximum number of retries on failure
+
+  Returns:
+      List of embedding vectors in the same order as texts; entries are None for empty
+      texts or if generation failed
+  """
+  results: List[Optional[List[float]]] = [None] * len(texts)
+
+  # Remember the positions of non-empty texts so results can be mapped back
+  positions = [i for i, text in enumerate(texts) if text and text.strip()]
+  if not positions:
+    logger.warning("Empty texts provided for embedding generation")
+    return results
+
+  if _client is None:
+    logger.error("OpenAI API key not found in environment variables")
+    return results
+
+  # Same truncation as generate_embedding
+  inputs = [_truncate(texts[i], model) for i in positions]
+
+  # Only cache misses are sent to the API, in length-sorted batches
+  embeddings = cache.get_or_compute_many(inputs, model, lambda misses: _create_embeddings_batched(misses, model, max_retries))
+  for position, embedding in zip(positions, embeddings):
+    results[position] = embedding
+  return results
+
+
+def _article_embeddings(title_embedding: Optional[List[float]], content_embedding: Optional[List[float]]) -> Dict[str, Any]:
+  """Collect the embeddings of an article that were generated successfully."""
+  result = {}
+  if title_embedding:
+    result["title_embedding"] = title_embedding
+  if content_embedding:
+    result["content_embedding"] = content_embedding
+  return result
+
+
+def generate_article_embeddings_batch(titles: List[str], contents: List[str]) -> List[Dict[str, Any]]:
+  """
+  Generate embeddings for the titles and contents of several articles.
+
+  All titles and contents go through one generate_embeddings_batch call, which groups them
+  into length-sorted API requests.
+
+  Args:
+      titles: The article titles
+      contents: The article contents (markdown), in the same order as titles
+
+  Returns:
+      One dictionary with title_embedding and content_embedding per article
+  """
+  embeddings = generate_embeddings_batch(list(titles) + list(contents))
+  return [
+    _article_embeddings(title_embedding, content_embedding)
+    for title_embedding, content_embedding in zip(embeddings[: len(titles)], embeddings[len(titles) :])
+  ]
 
 
 def generate_article_embeddings(title: str, content: str) -> Dict[str, Any]:
   """
   Generate embeddings for an article's title and content.
 
+  Both embeddings are requested in a single API call.
+
   Args:
       title: The article title
       content: The article content (markdown)
@@ -75,16 +422,90 @@ def generate_article_embeddings(title: str, content: str) -> Dict[str, Any]:
   Returns:
       Dictionary with title_embedding and content_embedding
   """
-  result = {}
+  return generate_article_embeddings_batch([title], [content])[0]
 
-  # Generate embeddings for title
-  title_embedding = generate_embedding(title)
-  if title_embedding:
-    result["title_embedding"] = title_embedding
 
-  # Generate embeddings for content
-  content_embedding = generate_embedding(content)
-  if content_embedding:
-    result["content_embedding"] = content_embedding
+async def agenerate_embeddings_batch(
+  texts: List[str], model: str = EMBEDDINGS_MODEL, max_retries: int = 3, client: Optional[openai.AsyncOpenAI] = None
+) -> List[Optional[List[float]]]:
+  """
+  Async version of generate_embeddings_batch.
 
-  return result
+  Awaits the OpenAI API instead of blocking, so many calls can run concurrently on one event loop.
+
+  Args:
+      texts: The texts to generate embeddings for
+      model: The OpenAI model to use
+      max_retries: Maximum number of retries on failure
+      client: AsyncOpenAI client to use, defaults to the shared module client
+
+  Returns:
+      List of embedding vectors in the same order as texts; entries are None for empty
+      texts or if generation failed
+  """
+  results: List[Optional[List[float]]] = [None] * len(texts)
+
+  positions = [i for i, text in enumerate(texts) if text and text.strip()]
+  if not positions:
+    logger.warning("Empty texts provided for embedding generation")
+    return results
+
+  client = client or _async_client
+  if client is None:
+    logger.error("OpenAI API key not found in environment variables")
+    return results
+
+  # Tokenizing is CPU-bound, so keep it off the event loop
+  inputs = await asyncio.to_thread(lambda: [_truncate(texts[i], model) for i in positions])
+
+  embeddings = await cache.aget_or_compute_many(inputs, model, lambda misses: _acreate_embeddings_batched(misses, model, max_retries, client))
+  for position, embedding in zip(positions, embeddings):
+    results[position] = embedding
+  return results
+
+
+async def agenerate_embedding(text: str, client: Optional[openai.AsyncOpenAI] = None, model: str = EMBEDDINGS_MODEL) -> Optional[List[float]]:
+  """
+  Async version of generate_embedding.
+
+  Args:
+      text: The text to generate embeddings for
+      client: AsyncOpenAI client to use, defaults to the shared module client
+      model: The OpenAI model to use
+
+  Returns:
+      Embedding vector, or None if generation failed
+  """
+  return (await agenerate_embeddings_batch([text], model=model, client=client))[0]
+
+
+async def agenerate_article_embeddings_batch(titles: List[str], contents: List[str]) -> List[Dict[str, Any]]:
+  """
+  Async version of generate_article_embeddings_batch.
+
+  Args:
+      titles: The article titles
+      contents: The article contents (markdown), in the same order as titles
+
+  Returns:
+      One dictionary with title_embedding and content_embedding per article
+  """
+  embeddings = await agenerate_embeddings_batch(list(titles) + list(contents))
+  return [
+    _article_embeddings(title_embedding, content_embedding)
+    for title_embedding, content_embedding in zip(embeddings[: len(titles)], embeddings[len(titles) :])
+  ]
+
+
+async def agenerate_article_embeddings(title: str, content: str) -> Dict[str, Any]:
+  """
+  Async version of generate_article_embeddings.
+
+  Args:
+      title: The article title
+      content: The article content (markdown)
+
+  Returns:
+      Dictionary with title_embedding and content_embedding
+  """
+  return (await agenerate_article_embeddings_batch([title], [content]))[0]
@@ -1,16 +1,23 @@
 import os
+import json
+import asyncio
 import logging
+import threading
+import multiprocessing
 from typing import Dict, Any, List, Optional
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 
 import uvicorn
+from cachetools import TTLCache, cached
 from fastapi import FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
-from simple_scraper import SimpleSEPScraper
-from supabase_client import SupabaseManager
+from embeddings import EMBEDDING_DIMENSIONS, EMBEDDINGS_MODEL
+from simple_scraper import ArticleNotFound, SimpleSEPScraper
+from supabase_client import SupabaseManager, aquery_embedding
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -32,9 +39,90 @@ app.add_middleware(
   allow_headers=["*"],
 )
 
-# Initialize scraper and database
-scraper = SimpleSEPScraper()
-db_manager = SupabaseManager()
+# API worker processes started by `python simple_api.py`
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Parsing processes per API worker; by default the cores are split between the API workers
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+
+# Scraper, database, caches and parsing processes, created by the startup hook rather than at import:
+# `python simple_api.py` imports this module again in every worker, and again as __mp_main__,
+# so anything created at import would be duplicated. Pages are parsed in the process pool, so
+# concurrent scrapes don't serialize on the event loop or the GIL.
+parse_pool: Optional[ProcessPoolExecutor] = None
+scraper: Optional[SimpleSEPScraper] = None
+db_manager: Optional[SupabaseManager] = None
+semantic_cache = None
+
+
+def create_semantic_cache():
+  """
+  Create the Redis semantic cache for vector search results.
+
+  The cache is optional: it is only enabled when REDIS_URL is set and redisvl is installed.
+
+  Returns:
+      SemanticCache instance, or None if the cache is disabled
+  """
+  redis_url = os.environ.get("REDIS_URL")
+  if not redis_url:
+    return None
+
+  try:
+    from redisvl.extensions.cache.llm import SemanticCache
+    from redisvl.utils.vectorize import BaseVectorizer
+
+    return SemanticCache(
+      name="sep_query_cache",
+      redis_url=redis_url,
+      distance_threshold=float(os.environ.get("SEMANTIC_CACHE_DISTANCE_THRESHOLD", 0.1)),
+      # Cleared when this API saves or re-embeds entries; entries written by other means (e.g. scripts)
+      # may be missing from cached results until they expire
+      ttl=int(os.environ.get("SEMANTIC_CACHE_TTL", 3600)),
+      # Every lookup and store passes its own vector, so the vectorizer only declares the dimensions;
+      # an OpenAI vectorizer would make a blocking embeddings call at startup to probe them
+      vectorizer=BaseVectorizer(model=EMBEDDINGS_MODEL, dims=EMBEDDING_DIMENSIONS),
+      filterable_fields=[
+        {"name": "search_type", "type": "tag"},
+        {"name": "limit", "type": "numeric"},
+        {"name": "similarity_threshold", "type": "numeric"},
+      ],
+    )
+  except Exception as e:
+    logger.warning(f"Semantic cache disabled: {e}")
+    return None
+
+
+# Entry count cache; the count only changes on /scrape, which clears it
+_count_cache = TTLCache(maxsize=1, ttl=30)
+
+
+@cached(_count_cache, lock=threading.Lock())
+def cached_count_entries(db: SupabaseManager) -> int:
+  """Return the number of entries, cached for 30 seconds; errors propagate and are not cached."""
+  return db.count_entries(raise_errors=True)
+
+
+def count_entries_or_zero(db: SupabaseManager) -> int:
+  """Return the cached number of entries, or 0 if counting failed; the failure is logged by count_entries and not cached."""
+  try:
+    return cached_count_entries(db)
+  except Exception:
+    return 0
+
+
+async def clear_search_caches(db: SupabaseManager):
+  """
+  Drop cached vector search results after entries were saved or re-embedded.
+
+  The Redis cache is shared by all workers; the in-process cache is only cleared in this worker,
+  so other workers may serve stale results for up to its 10 minute TTL.
+  """
+  db.search_cache.clear()
+  if semantic_cache is not None:
+    try:
+      await semantic_cache.aclear()
+    except Exception as e:
+      logger.warning(f"Failed to clear semantic cache: {e}")
 
 
 # Dependency for database access
@@ -56,12 +144,14 @@ class EntryList(BaseModel):
 
   entries: List[EntryItem]
   count: int
+  next_cursor: Optional[Dict[str, str]] = None
 
 
 class ScrapeRequest(BaseModel):
   """Request model for scrape endpoint."""
 
   url: str = Field(..., description="Full URL of the SEP article to scrape")
+  force: bool = Field(False, description="Re-scrape even if the article is unchanged since the last scrape")
 
 
 class ScrapeResult(BaseModel):
@@ -73,6 +163,30 @@ class ScrapeResult(BaseModel):
   message: str
 
 
+@app.on_event("startup")
+async def startup():
+  """Create the scraper, database manager and semantic cache, and start the parsing processes."""
+  global parse_pool, scraper, db_manager, semantic_cache
+  db_manager = SupabaseManager()
+  semantic_cache = await asyncio.to_thread(create_semantic_cache)
+  # Forking from the running, threaded worker can copy held locks into the children; forkserver forks
+  # them from a separate single-threaded server process instead. That server preloads this module once
+  # so the children inherit it, which creates nothing since the singletons above are made in this hook.
+  parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+  scraper = SimpleSEPScraper(executor=parse_pool)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+  """Close the scraper's and database's HTTP connections and the parsing processes."""
+  if scraper is not None:
+    await scraper.aclose()
+  if db_manager is not None:
+    db_manager.close()
+  if parse_pool is not None:
+    parse_pool.shutdown()
+
+
 # Error handler for unhandled exceptions
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -94,10 +208,18 @@ async def root():
       {
         "path": "/entries",
         "method": "GET",
-        "description": "List all articles in the database",
+        "description": "List all articles in the database, most recently updated first; the response's next_cursor "
+        "holds the cursor_updated_at and cursor_entry_id of the next page, or null on the last page",
         "parameters": [
           {"name": "limit", "type": "integer", "description": "Maximum number of entries to return (default: 100)"},
-          {"name": "offset", "type": "integer", "description": "Offset for pagination (default: 0)"},
+          {"name": "cursor_updated_at", "type": "string", "description": "updated_at of the next_cursor returned with the previous page"},
+          {"name": "cursor_entry_id", "type": "string", "description": "entry_id of the next_cursor returned with the previous page"},
+          {
+            "name": "offset",
+            "type": "integer",
+            "deprecated": True,
+            "description": "Offset for pagination (default: 0; deprecated, use the cursor instead)",
+          },
         ],
       },
       {
@@ -122,7 +244,11 @@ async def root():
           "schema": {
             "type": "object",
             "properties": {
-              "url": {"type": "string", "description": "Full URL of the SEP article to scrape (e.g., https://plato.stanford.edu/entries/kant/)"}
+              "url": {"type": "string", "description": "Full URL of the SEP article to scrape (e.g., https://plato.stanford.edu/entries/kant/)"},
+              "force": {
+                "type": "boolean",
+                "description": "Re-scrape even if the article is unchanged since the last scrape (default: false)",
+              },
             },
             "required": ["url"],
           },
@@ -158,7 +284,12 @@ async def root():
             "type": "object",
             "properties": {
               "limit": {"type": "integer", "description": "Maximum number of articles to process"},
-              "offset": {"type": "integer", "description": "Offset for pagination"},
+              "offset": {
+                "type": "integer",
+                "description": "Offset for pagination; unless force is set it counts only articles still missing an embedding, "
+                "so repeat with offset 0 until total_processed is 0",
+              },
+              "force": {"type": "boolean", "description": "Also re-embed articles that already have embeddings (default: false)"},
             },
           },
         },
@@ -170,18 +301,26 @@ async def root():
 @app.get("/entries", response_model=EntryList)
 async def list_entries(
   limit: int = Query(100, description="Maximum number of entries to return"),
-  offset: int = Query(0, description="Offset for pagination"),
+  offset: int = Query(0, description="Offset for pagination (deprecated, use the cursor instead)"),
+  cursor_updated_at: Optional[str] = Query(None, description="updated_at of the next_cursor returned with the previous page"),
+  cursor_entry_id: Optional[str] = Query(None, description="entry_id of the next_cursor returned with the previous page"),
   db: SupabaseManager = Depends(get_db),
 ):
   """List all entries in the database."""
   try:
-    entries = db.list_entries(limit=limit, offset=offset)
-    count = db.count_entries()
+    # The two queries are independent; run them concurrently in worker threads
+    page, count = await asyncio.gather(
+      asyncio.to_thread(db.list_entries, limit=limit, offset=offset, cursor_updated_at=cursor_updated_at, cursor_entry_id=cursor_entry_id),
+      asyncio.to_thread(count_entries_or_zero, db),
+    )
 
     # Transform entries to match the expected model
-    entry_items = [EntryItem(url=entry.get("url", ""), title=entry.get("title", "")) for entry in entries]
+    entry_items = [EntryItem(url=entry.get("url", ""), title=entry.get("title", "")) for entry in page["entries"]]
 
-    return {"entries": entry_items, "count": count}
+    return {"entries": entry_items, "count": count, "next_cursor": page["next_cursor"]}
+  except ValueError as e:
+    # Incomplete or malformed cursor
+    raise HTTPException(status_code=400, detail=str(e))
   except Exception as e:
     error_msg = f"Error listing entries: {str(e)}"
     logger.error(error_msg)
@@ -242,7 +381,8 @@ async def scrape_url(request: ScrapeRequest, db: SupabaseManager = Depends(get_d
   Scrape an article using its full URL and save to database.
 
   Args:
-      request: Request with URL of the SEP article to scrape
+      request: Request with URL of the SEP article to scrape, and whether to skip the
+          conditional request that returns early for unchanged articles
 
   Returns:
       Status message with scraping results
@@ -261,17 +401,19 @@ async def scrape_url(request: ScrapeRequest, db: SupabaseManager = Depends(get_d
     parts = url.rstrip("/").split("/")
     entry_id = parts[-1]  # Last part of the URL
 
-    # Check if the article exists at the provided URL
-    if not scraper.entry_exists(url):
-      raise HTTPException(status_code=404, detail=f"No article found at URL: {url}")
-
-    # Scrape the article
+    # Scrape the article (a missing article surfaces as ArticleNotFound), revalidating
+    # against the validators stored by the previous scrape unless a re-scrape is forced
+    stored = await asyncio.to_thread(db.get_http_validators, entry_id) or {}
+    validators = {} if request.force else stored
     logger.info(f"Scraping article from URL: {url}")
-    data = scraper.scrape_article(url)
+    data = await scraper.scrape_article(url, etag=validators.get("etag"), last_modified=validators.get("http_last_modified"))
+
+    if data is None:
+      return {"url": url, "title": stored.get("title", ""), "success": True, "message": "Article unchanged since last scrape"}
 
-    # Save to database
+    # Save to database, generating embeddings without blocking the event loop
     metadata = data["metadata"]
-    success = db.save_entry(
+    success = await db.save_entry_async(
       entry_id=entry_id,
       title=data["title"],
       url=url,
@@ -283,15 +425,23 @@ async def scrape_url(request: ScrapeRequest, db: SupabaseManager = Depends(get_d
       markdown=data["content"],
       toc=data.get("toc"),
       authors=metadata.get("authors", []),
+      etag=data.get("etag"),
+      http_last_modified=data.get("last_modified"),
+      # Known from the validators lookup, so the save doesn't read the stored row again
+      unchanged=db.is_unchanged(stored, data.get("content_hash")),
     )
 
     if success:
+      _count_cache.clear()
+      await clear_search_caches(db)
       logger.info(f"Successfully scraped and saved URL: {url}")
       return {"url": url, "title": data["title"], "success": True, "message": "Article successfully scraped and saved to database"}
     else:
       error_msg = f"Failed to save article to database for URL: {url}"
       logger.error(error_msg)
       return {"url": url, "title": data["title"], "success": False, "message": "Article was scraped but could not be saved to database"}
+  except ArticleNotFound:
+    raise HTTPException(status_code=404, detail=f"No article found at URL: {url}")
   except HTTPException:
     # Re-raise HTTP exceptions
     raise
@@ -346,8 +496,35 @@ async def vector_search(
     if similarity_threshold < 0 or similarity_threshold > 1:
       raise HTTPException(status_code=400, detail="similarity_threshold must be between 0 and 1")
 
+    query_embedding = None
+    if semantic_cache is not None:
+      from redisvl.query.filter import Num, Tag
+
+      # Queries are only served from the cache for the same search parameters
+      cache_filters = {"search_type": search_type, "limit": limit, "similarity_threshold": similarity_threshold}
+      filter_expression = (Tag("search_type") == search_type) & (Num("limit") == limit) & (Num("similarity_threshold") == similarity_threshold)
+
+      # The embedding is reused by both the cache lookup and the database search; it is made the same
+      # way vector_search makes its own, so results don't depend on whether Redis is configured
+      query_embedding = await aquery_embedding(query)
+      if query_embedding:
+        try:
+          cached = await semantic_cache.acheck(vector=query_embedding, filter_expression=filter_expression)
+          if cached:
+            logger.info(f"Semantic cache hit for vector search query: {query}")
+            results = json.loads(cached[0]["response"])
+            return {"query": query, "search_type": search_type, "similarity_threshold": similarity_threshold, "results": results, "count": len(results)}
+        except Exception as e:
+          logger.warning(f"Semantic cache lookup failed: {e}")
+
     # Perform vector search
-    results = db.vector_search(query, limit=limit, search_type=search_type, similarity_threshold=similarity_threshold)
+    results = db.vector_search(query, limit=limit, search_type=search_type, similarity_threshold=similarity_threshold, query_embedding=query_embedding)
+
+    if semantic_cache is not None and query_embedding and results:
+      try:
+        await semantic_cache.astore(prompt=query, response=json.dumps(results), vector=query_embedding, filters=cache_filters)
+      except Exception as e:
+        logger.warning(f"Failed to store vector search results in semantic cache: {e}")
 
     return {"query": query, "search_type": search_type, "similarity_threshold": similarity_threshold, "results": results, "count": len(results)}
   except Exception as e:
@@ -360,7 +537,12 @@ class RegenerateEmbeddingsRequest(BaseModel):
   """Request model for regenerating embeddings."""
 
   limit: int = Field(10, description="Maximum number of articles to process")
-  offset: int = Field(0, description="Offset for pagination")
+  offset: int = Field(
+    0,
+    description="Offset for pagination. Unless force is set, it counts only articles still missing an embedding, which drop out once "
+    "processed: repeat with offset 0 until total_processed is 0, raising it by failure_count to skip articles that keep failing",
+  )
+  force: bool = Field(False, description="Also re-embed articles that already have embeddings")
 
 
 @app.post("/regenerate-embeddings")
@@ -369,17 +551,31 @@ async def regenerate_embeddings(request: RegenerateEmbeddingsRequest, db: Supaba
   Regenerate embeddings for existing articles.
 
   Args:
-      request: Request with limit and offset parameters
+      request: Request with limit, offset and force parameters
 
   Returns:
       Results of the regeneration process
   """
   try:
     # Regenerate embeddings
-    results = db.regenerate_embeddings(limit=request.limit, offset=request.offset)
+    results = await db.aregenerate_embeddings(limit=request.limit, offset=request.offset, force=request.force)
+    if results.get("success_count"):
+      await clear_search_caches(db)
 
     return {"status": "success", "message": f"Processed {results.get('total_processed', 0)} articles", "results": results}
   except Exception as e:
     error_msg = f"Error regenerating embeddings: {str(e)}"
     logger.error(f"{error_msg}\n{traceback.format_exc()}")
     raise HTTPException(status_code=500, detail=error_msg)
+
+
+if __name__ == "__main__":
+  # One worker per core; each worker runs the startup hook, so the scraper, database and caches are created once per worker
+  uvicorn.run(
+    "simple_api:app",
+    host="0.0.0.0",
+    port=int(os.environ.get("PORT", 8010)),
+    workers=WEB_CONCURRENCY,
+    loop="uvloop",
+    http="httptools",
+  )
@@ -1,83 +1,352 @@
 import os
 import re
-import hashlib
-import requests
-from bs4 import BeautifulSoup
-import html2text
-from typing import Dict, List, Tuple, Any
+import asyncio
+from concurrent.futures import Executor
+import httpx
+from blake3 import blake3
+import lxml.html
+from lxml.html import HtmlElement
+from typing import Dict, List, Tuple, Any, Optional
 import logging
 import traceback
 
 logger = logging.getLogger(__name__)
 
+# Prefix of content hashes, identifying the hash algorithm
+CONTENT_HASH_PREFIX = "b3:"
+
+# Request headers sent with every request; compressed transfer cuts page size ~4x
+DEFAULT_HEADERS = {
+  "Accept-Encoding": "gzip, br",
+  "User-Agent": "SEP-scraper/1.0 (+https://github.com/kristianernst/SEP-scraper)",
+}
+
+# Retry policy for transient upstream failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.3
+# Longest Retry-After we wait out; a server asking for more gets its response returned instead
+RETRY_MAX_DELAY = 30
+
+# Patterns used to extract article metadata
+_RE_ISSUED = re.compile(r"First published\s+(.+?)(?=;|\n|$)")
+_RE_MODIFIED = re.compile(r"substantive revision\s+(.+?)(?=;|\n|$)")
+_RE_AUTHOR_PREFIX = re.compile(r"^Entry by\s*:\s*")
+_RE_AUTHOR_SPLIT = re.compile(r",\s*|\s+and\s+|\s*&\s*")
+
+# Markdown emitter for the subset of HTML used by SEP articles
+_RE_WHITESPACE = re.compile(r"\s+")
+_RE_SPACES = re.compile(r" {2,}")
+_BLOCK_TAGS = frozenset(
+  {
+    "address", "article", "aside", "blockquote", "center", "dd", "div", "dl", "dt", "figcaption", "figure", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "ul",
+  }
+)  # fmt: skip
+_SKIP_TAGS = frozenset({"head", "noscript", "script", "style", "template"})
+_EMPHASIS_TAGS = {"em": "_", "i": "_", "cite": "_", "dfn": "_", "var": "_", "strong": "**", "b": "**"}
+_CODE_TAGS = frozenset({"code", "kbd", "samp", "tt"})
+
+
+def _element_to_markdown(elem: HtmlElement) -> str:
+  """Convert an element and its descendants to markdown in a single traversal."""
+  return "\n\n".join(_render_blocks(elem)) + "\n"
+
+
+def _render_blocks(elem: HtmlElement) -> List[str]:
+  """Render the children of a block container as a list of markdown blocks."""
+  blocks: List[str] = []
+  inline: List[str] = []
+
+  def flush():
+    text = _finish_inline("".join(inline))
+    inline.clear()
+    if text:
+      blocks.append(text)
+
+  if elem.text:
+    inline.append(_RE_WHITESPACE.sub(" ", elem.text))
+  for child in elem:
+    tag = child.tag if isinstance(child.tag, str) else None
+    if tag is None or tag in _SKIP_TAGS:
+      pass
+    elif tag in _BLOCK_TAGS:
+      flush()
+      blocks.extend(_render_block(child))
+    else:
+      inline.append(_render_inline(child))
+    if child.tail:
+      inline.append(_RE_WHITESPACE.sub(" ", child.tail))
+  flush()
+
+  return blocks
+
+
+def _render_block(elem: HtmlElement) -> List[str]:
+  """Render a single block-level element."""
+  tag = elem.tag
+
+  if tag in ("h1", "h2", "h3", "h4", "h5", "h6"):
+    text = _finish_inline(_render_inline_children(elem)).replace("  \n", " ")
+    return [f"{'#' * int(tag[1])} {text}"] if text else []
+
+  if tag == "hr":
+    return ["* * *"]
+
+  if tag == "pre":
+    return ["```\n" + elem.text_content().strip("\n") + "\n```"]
+
+  if tag == "blockquote":
+    inner = "\n\n".join(_render_blocks(elem))
+    return ["\n".join(f"> {line}" if line else ">" for line in inner.split("\n"))] if inner else []
+
+  if tag in ("ul", "ol"):
+    return [_render_list(elem)]
+
+  if tag == "table":
+    return [_render_table(elem)]
+
+  return _render_blocks(elem)
+
+
+def _render_list(elem: HtmlElement) -> str:
+  """Render an ordered or unordered list; nested lists are indented under their item."""
+  lines: List[str] = []
+  number = int(elem.get("start", 1)) if elem.get("start", "1").isdigit() else 1
+
+  for item in elem:
+    if item.tag != "li":
+      continue
+    marker = f"{number}. " if elem.tag == "ol" else "* "
+    number += 1
+
+    item_lines = "\n".join(_render_blocks(item)).split("\n")
+    lines.append(marker + item_lines[0])
+    lines.extend(" " * len(marker) + line if line else "" for line in item_lines[1:])
+
+  return "\n".join(lines)
+
+
+def _render_table(elem: HtmlElement) -> str:
+  """Render a table as a markdown pipe table, using the first row as header."""
+  rows = []
+  for row in elem.iter("tr"):
+    cells = [_finish_inline(_render_inline_children(cell)).replace("  \n", " ").replace("|", "\\|") for cell in row if cell.tag in ("th", "td")]
+    rows.append("| " + " | ".join(cells) + " |")
+    if len(rows) == 1:
+      rows.append("|" + " --- |" * len(cells))
+  return "\n".join(rows)
+
+
+def _render_inline(elem: HtmlElement) -> str:
+  """Render an inline element, including nested inline markup."""
+  tag = elem.tag
+
+  if tag == "br":
+    return "\n"
+
+  if tag == "img":
+    src = elem.get("src")
+    return f"![{elem.get('alt', '')}]({src})" if src else ""
+
+  if tag in _CODE_TAGS:
+    text = _RE_WHITESPACE.sub(" ", elem.text_content())
+    return f"`{text}`" if text.strip() else text
+
+  content = _render_inline_children(elem)
+
+  if tag in _EMPHASIS_TAGS:
+    return _wrap(content, _EMPHASIS_TAGS[tag])
+
+  if tag == "a":
+    href = elem.get("href")
+    if href and content.strip():
+      return _wrap(content, "[", f"]({href})")
+
+  return content
+
+
+def _render_inline_children(elem: HtmlElement) -> str:
+  """Render the text and children of an element as inline markdown."""
+  # Source line breaks in text are plain whitespace; only <br> renders as "\n"
+  parts = [_RE_WHITESPACE.sub(" ", elem.text or "")]
+  for child in elem:
+    if isinstance(child.tag, str) and child.tag not in _SKIP_TAGS:
+      parts.append(_render_inline(child))
+    parts.append(_RE_WHITESPACE.sub(" ", child.tail or ""))
+  return "".join(parts)
+
+
+def _wrap(content: str, prefix: str, suffix: str = None) -> str:
+  """Wrap content in markdown markers, keeping surrounding whitespace outside the markers."""
+  stripped = content.strip()
+  if not stripped:
+    return content
+  leading = " " if content[0].isspace() else ""
+  trailing = " " if content[-1].isspace() else ""
+  return f"{leading}{prefix}{stripped}{prefix if suffix is None else suffix}{trailing}"
+
+
+def _finish_inline(text: str) -> str:
+  """Collapse repeated spaces in rendered inline text; <br> line breaks become markdown hard breaks."""
+  lines = (_RE_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+  return "  \n".join(line for line in lines if line)
+
+
+class ArticleNotFound(Exception):
+  """Raised when no SEP article exists at the requested URL."""
+
 
 class SimpleSEPScraper:
   """Minimal scraper for Stanford Encyclopedia of Philosophy articles."""
 
-  def __init__(self):
-    """Initialize the scraper."""
-    self.session = requests.Session()
+  def __init__(self, executor: Optional[Executor] = None):
+    """
+    Initialize the scraper.
 
-    # Configure html2text for markdown conversion
-    self.md_converter = html2text.HTML2Text()
-    self.md_converter.ignore_links = False
-    self.md_converter.ignore_images = False
-    self.md_converter.ignore_tables = False
-    self.md_converter.body_width = 0  # No text wrapping
+    Args:
+        executor: Executor for parsing fetched pages, e.g. a ProcessPoolExecutor to parse several
+            articles in parallel; defaults to the event loop's thread pool
+    """
+    self.executor = executor
+    # One pooled HTTP/2 client, so concurrent scrapes share a connection to plato.stanford.edu
+    # The transport also retries failed connection attempts
+    transport = httpx.AsyncHTTPTransport(http2=True, retries=MAX_RETRIES, limits=httpx.Limits(max_connections=50, max_keepalive_connections=20))
+    self.client = httpx.AsyncClient(transport=transport, timeout=30, follow_redirects=True, headers=DEFAULT_HEADERS)
 
-  def scrape_article(self, url: str) -> Dict[str, Any]:
+  async def scrape_article(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[Dict[str, Any]]:
     """
     Scrape an article from a URL.
 
     Args:
         url: Full URL of the article to scrape (e.g., https://plato.stanford.edu/entries/kant/)
+        etag: ETag from a previous scrape, sent as If-None-Match
+        last_modified: Last-Modified from a previous scrape, sent as If-Modified-Since
 
     Returns:
-        Dictionary containing article data
+        Dictionary containing article data, or None if the article is unchanged since the
+        previous scrape
+
+    Raises:
+        ArticleNotFound: If the server responds with 404 for the URL
     """
     try:
-      # Clean URL and extract entry_id
+      # Clean URL
       url = url.rstrip("/")
-      parts = url.split("/")
-      entry_id = parts[-1]  # Last part of the URL
-
-      # Fetch article
-      logger.info(f"Fetching article from URL: {url}")
-      response = self.session.get(url)
-      response.raise_for_status()
-      html_content = response.text
-
-      # Parse HTML
-      soup = BeautifulSoup(html_content, "html.parser")
-
-      # Extract title
-      title_elem = soup.select_one("h1.title")
-      title = title_elem.text.strip() if title_elem else entry_id.replace("-", " ").title()
-
-      # Extract metadata and content
-      metadata = self._extract_metadata(soup)
-      article_content, toc = self._process_content(soup)
-      markdown_content = self.convert_to_markdown(article_content)
-
-      # Generate content hash for change detection
-      content_hash = hashlib.sha256(article_content.encode()).hexdigest()
-
-      return {
-        "entry_id": entry_id,
-        "url": url,
-        "title": title,
-        "content_hash": content_hash,
-        "metadata": metadata,
-        "content": markdown_content,
-        "toc": toc,
-        "html_content": article_content,
-      }
+
+      response = await self._fetch(url, etag=etag, last_modified=last_modified)
+      if response is None:
+        return None
+
+      # Parsing is CPU-bound, run it in the executor so it doesn't block the event loop
+      loop = asyncio.get_running_loop()
+      data = await loop.run_in_executor(self.executor, SimpleSEPScraper._parse_and_convert, response.text, url)
+
+      # Validators for conditional requests on the next scrape
+      data["etag"] = response.headers.get("ETag")
+      data["last_modified"] = response.headers.get("Last-Modified")
+      return data
+    except ArticleNotFound:
+      logger.warning(f"No article found at URL: {url}")
+      raise
     except Exception as e:
       error_text = f"Error scraping article from {url}: {str(e)}\n{traceback.format_exc()}"
       logger.error(error_text)
       raise RuntimeError(error_text)
 
-  def _extract_metadata(self, soup: BeautifulSoup) -> Dict[str, Any]:
+  async def _fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Optional[httpx.Response]:
+    """
+    Fetch an article page.
+
+    Returns:
+        The successful response, or None if the article is unchanged since the previous scrape
+
+    Raises:
+        ArticleNotFound: If the server responds with 404 for the URL
+    """
+    logger.info(f"Fetching article from URL: {url}")
+    # Conditional request, so unchanged articles are neither downloaded nor parsed
+    headers = {}
+    if etag:
+      headers["If-None-Match"] = etag
+    if last_modified:
+      headers["If-Modified-Since"] = last_modified
+
+    response = await self._get(url, headers=headers)
+    if response.status_code == 304:
+      logger.info(f"Article not modified since last scrape: {url}")
+      return None
+    if response.status_code == 404:
+      raise ArticleNotFound(f"No article found at URL: {url}")
+    response.raise_for_status()
+    return response
+
+  async def _get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """
+    GET a URL, retrying rate-limited and 5xx responses with exponential backoff.
+
+    Returns:
+        The final response, which may still carry a retryable status after MAX_RETRIES retries
+        or when the server's Retry-After exceeds RETRY_MAX_DELAY seconds
+    """
+    for attempt in range(MAX_RETRIES + 1):
+      response = await self.client.get(url, headers=headers)
+      if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+        return response
+
+      delay = RETRY_BACKOFF_FACTOR * 2**attempt
+      retry_after = response.headers.get("Retry-After", "")
+      if retry_after.isdigit():
+        if int(retry_after) > RETRY_MAX_DELAY:
+          logger.warning(f"Got HTTP {response.status_code} from {url} with Retry-After {retry_after}s, not retrying")
+          return response
+        delay = max(delay, int(retry_after))
+
+      logger.warning(f"Got HTTP {response.status_code} from {url}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+      await asyncio.sleep(delay)
+
+  @staticmethod
+  def _parse_and_convert(html_content: str, url: str) -> Dict[str, Any]:
+    """
+    Parse a fetched article page and convert its content to markdown.
+
+    A static method taking and returning plain data, so it can be pickled and run in a process pool.
+
+    Returns:
+        Dictionary containing article data
+    """
+    entry_id = url.split("/")[-1]  # Last part of the URL
+
+    # Parse HTML straight into a native lxml tree
+    tree = lxml.html.document_fromstring(html_content)
+
+    # Extract title
+    title_elem = next((elem for elem in tree.find_class("title") if elem.tag == "h1"), None)
+    title = title_elem.text_content().strip() if title_elem is not None else entry_id.replace("-", " ").title()
+
+    # Extract metadata and content
+    metadata = SimpleSEPScraper._extract_metadata(tree)
+    content_elem, article_content, toc = SimpleSEPScraper._process_content(tree)
+
+    # Emit markdown from the already-parsed tree instead of re-parsing the HTML string
+    markdown_content = _element_to_markdown(content_elem) if content_elem is not None else ""
+
+    # Generate content hash for change detection (prefixed so older sha256 hashes can coexist)
+    content_hash = CONTENT_HASH_PREFIX + blake3(article_content.encode()).hexdigest()
+
+    return {
+      "entry_id": entry_id,
+      "url": url,
+      "title": title,
+      "content_hash": content_hash,
+      "metadata": metadata,
+      "content": markdown_content,
+      "toc": toc,
+      "html_content": article_content,
+    }
+
+  @staticmethod
+  def _extract_metadata(tree: HtmlElement) -> Dict[str, Any]:
     """
     Extract metadata from article.
 
@@ -87,77 +356,81 @@ class SimpleSEPScraper:
     metadata = {}
 
     # Extract preamble (if any)
-    preamble_elem = soup.select_one("#preamble")
-    if preamble_elem:
-      metadata["preamble"] = preamble_elem.text.strip()
+    preamble_elem = tree.get_element_by_id("preamble", None)
+    if preamble_elem is not None:
+      metadata["preamble"] = preamble_elem.text_content().strip()
 
     # Extract publication info
-    pub_info = soup.select_one("#pubinfo")
-    if pub_info:
-      pub_text = pub_info.text.strip()
+    pub_info = tree.get_element_by_id("pubinfo", None)
+    if pub_info is not None:
+      pub_text = pub_info.text_content().strip()
 
       # Extract date issued
-      issued_match = re.search(r"First published\s+(.+?)(?=;|\n|$)", pub_text)
+      issued_match = _RE_ISSUED.search(pub_text)
       if issued_match:
         metadata["date_issued"] = issued_match.group(1).strip()
 
       # Extract date modified
-      modified_match = re.search(r"substantive revision\s+(.+?)(?=;|\n|$)", pub_text)
+      modified_match = _RE_MODIFIED.search(pub_text)
       if modified_match:
         metadata["date_modified"] = modified_match.group(1).strip()
 
     # Extract authors
     authors = []
-    author_elem = soup.select_one("#aueditor")
-    if author_elem:
-      authors_text = author_elem.text.strip()
+    author_elem = tree.get_element_by_id("aueditor", None)
+    if author_elem is not None:
+      authors_text = author_elem.text_content().strip()
       # Remove "Entry by" if present
-      authors_text = re.sub(r"^Entry by\s*:\s*", "", authors_text)
+      authors_text = _RE_AUTHOR_PREFIX.sub("", authors_text)
       # Split by commas, 'and', or '&'
-      author_parts = re.split(r",\s*|\s+and\s+|\s*&\s*", authors_text)
+      author_parts = _RE_AUTHOR_SPLIT.split(authors_text)
       authors = [author.strip() for author in author_parts if author.strip()]
 
     metadata["authors"] = authors
 
     return metadata
 
-  def _process_content(self, soup: BeautifulSoup) -> Tuple[str, List[Dict[str, Any]]]:
+  @staticmethod
+  def _process_content(tree: HtmlElement) -> Tuple[Optional[HtmlElement], str, List[Dict[str, Any]]]:
     """
     Process article content and extract table of contents.
 
     Returns:
-        Tuple of (processed_html, toc)
+        Tuple of (content_element, processed_html, toc)
     """
     # Get the main content element
-    content_elem = soup.select_one("#main-content")
+    content_elem = tree.get_element_by_id("main-content", None)
 
-    if not content_elem:
+    if content_elem is None:
       # Fallback to aueditable (some older articles use this)
-      content_elem = soup.select_one(".aueditable")
+      content_elem = next(iter(tree.find_class("aueditable")), None)
 
-    if not content_elem:
+    if content_elem is None:
       # Last resort, try to find content by elimination
-      body = soup.body
-      if body:
-        for elem in body.select("#header, #footer, script, style"):
-          elem.decompose()
+      body = tree.find("body")
+      if body is not None:
+        for elem in body.xpath('.//script | .//style | .//*[@id="header"] | .//*[@id="footer"]'):
+          elem.drop_tree()
         content_elem = body
 
     # Extract table of contents
-    toc = self._extract_toc(content_elem)
+    toc = SimpleSEPScraper._extract_toc(content_elem)
 
     # Return content as HTML string
-    return str(content_elem), toc
+    if content_elem is None:
+      return None, "", toc
+    return content_elem, lxml.html.tostring(content_elem, encoding="unicode", with_tail=False), toc
 
-  def _extract_toc(self, content_elem: BeautifulSoup) -> List[Dict[str, Any]]:
+  @staticmethod
+  def _extract_toc(content_elem: Optional[HtmlElement]) -> List[Dict[str, Any]]:
     """Extract table of contents from content."""
     toc = []
 
-    if not content_elem:
+    if content_elem is None:
       return toc
 
     # Find all headings
-    headings = content_elem.select("h2, h3, h4, h5, h6")
+    headings = content_elem.iter("h2", "h3", "h4", "h5", "h6")
 
     for heading in headings:
       # Skip headings without IDs
@@ -165,17 +438,17 @@ class SimpleSEPScraper:
         continue
 
       # Get heading level (h2 = 1, h3 = 2, etc.)
-      level = int(heading.name[1]) - 1
+      level = int(heading.tag[1]) - 1
 
-      toc.append({"id": heading.get("id"), "text": heading.text.strip(), "level": level})
+      toc.append({"id": heading.get("id"), "text": heading.text_content().strip(), "level": level})
 
     return toc
 
   def convert_to_markdown(self, html: str) -> str:
     """Convert HTML to markdown."""
-    return self.md_converter.handle(html)
+    return _element_to_markdown(lxml.html.fragment_fromstring(html, create_parent="div"))
 
-  def entry_exists(self, url: str) -> bool:
+  async def entry_exists(self, url: str) -> bool:
     """
     Check if an article exists at the provided URL.
 
@@ -192,9 +465,13 @@ class SimpleSEPScraper:
         return False
 
       # Make a HEAD request to check if URL exists
-      response = self.session.head(url)
+      response = await self.client.head(url)
       return response.status_code == 200
     except Exception as e:
       error_text = f"Error checking if URL exists: {url} - {str(e)}"
       logger.error(error_text)
       return False
+
+  async def aclose(self):
+    """Close the underlying HTTP client."""
+    await self.client.aclose()
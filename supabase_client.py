@@ -1,23 +1,220 @@
 import os
-from typing import Dict, Any, List, Optional, Union
+import gzip
+import random
+import asyncio
+from typing import Dict, Any, Hashable, List, Optional, Union
 from datetime import datetime
 from dotenv import load_dotenv
 import logging
+import threading
+import time
 import traceback
 import httpx
+import numpy as np
+from cachetools import TTLCache
 
 load_dotenv()
 
 from supabase import create_client
-from embeddings import generate_article_embeddings
+from postgrest import APIError, CountMethod, ReturnMethod
+from embeddings import (
+  EMBEDDING_CONCURRENCY,
+  agenerate_article_embeddings,
+  agenerate_article_embeddings_batch,
+  agenerate_embedding,
+  generate_article_embeddings,
+  generate_article_embeddings_batch,
+  generate_embedding,
+)
 
 logger = logging.getLogger(__name__)
 
+# entry_metadata columns returned by default, leaving out the large embedding columns
+METADATA_COLUMNS = "entry_id, title, last_updated, published, preamble, authors, content_hash, created_at, updated_at"
+
+# Rows per bulk upsert request, keeping request bodies well below PostgREST's payload limit
+UPSERT_BATCH_SIZE = 100
+
+# Request bodies from this size on are gzip-compressed when request compression is enabled
+GZIP_MIN_BYTES = 4096
+
+# Query embeddings by normalized query text, so repeated searches skip the embeddings API
+_query_embedding_cache = TTLCache(maxsize=1024, ttl=3600)
+_query_embedding_lock = threading.Lock()
+
+
+def _pgvector_literal(embedding: List[float]) -> str:
+  """
+  Format an embedding as a pgvector text literal at float16, the precision of the halfvec columns.
+
+  Values are written in their shortest decimal form, which round-trips exactly. numpy formats
+  the whole vector at once, and PostgREST ships one short string instead of a JSON array.
+  """
+  return "[" + ",".join(np.asarray(embedding, dtype=np.float16).astype(str)) + "]"
+
+
+def _gzip_request_body(request: httpx.Request):
+  """httpx request hook that gzip-compresses large request bodies, such as article HTML and markdown."""
+  if "Content-Encoding" in request.headers:
+    return
+
+  body = request.read()
+  if len(body) < GZIP_MIN_BYTES:
+    return
+
+  compressed = gzip.compress(body, compresslevel=6)
+  request.headers["Content-Encoding"] = "gzip"
+  request.headers["Content-Length"] = str(len(compressed))
+  request.stream = httpx.ByteStream(compressed)
+  # Keep request.content consistent with the stream that is sent
+  request._content = compressed
+
+
+def _validate_cursor(cursor_updated_at: Optional[str], cursor_entry_id: Optional[str]):
+  """
+  Check a keyset cursor before it is embedded in a PostgREST filter.
+
+  Raises:
+      ValueError: If only one of the two values is given, updated_at is not an ISO timestamp,
+          or entry_id contains characters that are special in PostgREST filters
+  """
+  if (cursor_updated_at is None) != (cursor_entry_id is None):
+    raise ValueError("cursor_updated_at and cursor_entry_id must be given together")
+  if cursor_updated_at is None:
+    return
+
+  try:
+    datetime.fromisoformat(cursor_updated_at)
+  except ValueError:
+    raise ValueError(f"cursor_updated_at is not an ISO timestamp: {cursor_updated_at}")
+  if not cursor_entry_id or any(char in cursor_entry_id for char in '",()\\'):
+    raise ValueError(f"Invalid cursor_entry_id: {cursor_entry_id}")
+
+
+def _normalize_query(query: str) -> str:
+  """Normalize a search query before embedding it, so case and whitespace variants share a vector."""
+  return " ".join(query.lower().split())
+
+
+def _query_embedding(query: str) -> Optional[List[float]]:
+  """Return the embedding of a search query, cached for an hour; failures are not cached."""
+  normalized = _normalize_query(query)
+  with _query_embedding_lock:
+    embedding = _query_embedding_cache.get(normalized)
+  if embedding is not None:
+    return embedding
+
+  embedding = generate_embedding(normalized)
+  if embedding:
+    with _query_embedding_lock:
+      _query_embedding_cache[normalized] = embedding
+  return embedding
+
+
+async def aquery_embedding(query: str) -> Optional[List[float]]:
+  """Async version of _query_embedding, with the same normalization and cache."""
+  normalized = _normalize_query(query)
+  with _query_embedding_lock:
+    embedding = _query_embedding_cache.get(normalized)
+  if embedding is not None:
+    return embedding
+
+  embedding = await agenerate_embedding(normalized)
+  if embedding:
+    with _query_embedding_lock:
+      _query_embedding_cache[normalized] = embedding
+  return embedding
+
+
+class SemanticSearchCache:
+  """
+  In-memory cache of vector search results, looked up by query embedding similarity.
+
+  Each namespace (e.g. one per search type) holds up to max_entries unit-normalized query
+  embeddings in a numpy ring buffer, so a lookup is one matrix-vector product and the oldest
+  entry is evicted first. The buffer starts at initial_entries rows and doubles as it fills.
+  Every entry also records the search parameters it was stored with, and only matches lookups
+  with the same parameters. Entries expire after ttl_seconds.
+  """
+
+  def __init__(self, max_entries: int = 512, min_similarity: float = 0.97, ttl_seconds: float = 600, initial_entries: int = 16):
+    self.max_entries = max_entries
+    self.min_similarity = min_similarity
+    self.ttl_seconds = ttl_seconds
+    self.initial_entries = min(initial_entries, max_entries)
+    self._namespaces: Dict[Hashable, Dict[str, Any]] = {}
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def _unit(embedding: List[float]) -> Optional[np.ndarray]:
+    """Return the embedding as a unit-length float32 vector, or None for a zero vector."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+  def get(self, namespace: Hashable, embedding: List[float], params: Hashable = None) -> Optional[List[Dict]]:
+    """Return the cached results of the most similar unexpired query above min_similarity stored with the same params, if any."""
+    query = self._unit(embedding)
+    with self._lock:
+      entries = self._namespaces.get(namespace)
+      if query is None or entries is None or entries["vectors"].shape[1] != query.shape[0]:
+        return None
+
+      similarities = entries["vectors"] @ query
+      similarities[entries["created"] < time.monotonic() - self.ttl_seconds] = -np.inf
+      similarities[[slot_params != params for slot_params in entries["params"]]] = -np.inf
+      best = int(np.argmax(similarities))
+      if similarities[best] > self.min_similarity:
+        return entries["results"][best]
+      return None
+
+  def set(self, namespace: Hashable, embedding: List[float], results: List[Dict], params: Hashable = None):
+    """Cache the results of a query, evicting the oldest entry of the namespace when it is full."""
+    vector = self._unit(embedding)
+    if vector is None:
+      return
+
+    with self._lock:
+      entries = self._namespaces.get(namespace)
+      if entries is None or entries["vectors"].shape[1] != vector.shape[0]:
+        entries = {
+          "vectors": np.zeros((self.initial_entries, vector.shape[0]), dtype=np.float32),
+          "created": np.full(self.initial_entries, -np.inf),
+          "results": [None] * self.initial_entries,
+          "params": [None] * self.initial_entries,
+          "next": 0,
+        }
+        self._namespaces[namespace] = entries
+
+      slot = entries["next"]
+      capacity = len(entries["created"])
+      if slot == capacity:
+        if capacity < self.max_entries:
+          # Full but below max_entries: double the buffer
+          grown = min(capacity * 2, self.max_entries) - capacity
+          entries["vectors"] = np.concatenate([entries["vectors"], np.zeros((grown, vector.shape[0]), dtype=np.float32)])
+          entries["created"] = np.concatenate([entries["created"], np.full(grown, -np.inf)])
+          entries["results"].extend([None] * grown)
+          entries["params"].extend([None] * grown)
+        else:
+          slot = 0
+
+      entries["vectors"][slot] = vector
+      entries["created"][slot] = time.monotonic()
+      entries["results"][slot] = results
+      entries["params"][slot] = params
+      entries["next"] = slot + 1
+
+  def clear(self):
+    """Drop all cached results, e.g. after the searched entries changed."""
+    with self._lock:
+      self._namespaces.clear()
+
 
 class SupabaseManager:
   """Supabase manager for SEP scraper."""
 
-  def __init__(self, supabase_url: str = None, supabase_key: str = None, enable_embeddings: bool = True):
+  def __init__(self, supabase_url: str = None, supabase_key: str = None, enable_embeddings: bool = True, compress_requests: bool = None):
     """
     Initialize Supabase manager.
 
@@ -25,6 +222,9 @@ class SupabaseManager:
         supabase_url: Supabase URL, defaults to environment variable SUPABASE_URL
         supabase_key: Supabase key, defaults to environment variable SUPABASE_KEY
         enable_embeddings: Whether to generate and store embeddings for vector search
+        compress_requests: Whether to gzip request bodies of GZIP_MIN_BYTES or more, defaults to
+            environment variable SUPABASE_GZIP_REQUESTS; only enable it if the gateway in front of
+            PostgREST decompresses request bodies
     """
     # Get Supabase connection info from environment variables or parameters
     self.supabase_url = supabase_url or os.environ.get("SUPABASE_URL")
@@ -37,6 +237,38 @@ class SupabaseManager:
     # Create Supabase client
     self.client = create_client(self.supabase_url, self.supabase_key)
 
+    if compress_requests is None:
+      compress_requests = os.environ.get("SUPABASE_GZIP_REQUESTS", "").lower() in ("1", "true", "yes")
+    if compress_requests:
+      self.client.postgrest.session.event_hooks["request"].append(_gzip_request_body)
+
+    # Results of recent vector searches, reused for near-identical queries
+    self.search_cache = SemanticSearchCache()
+
+    # Pooled client for direct REST calls, so they reuse connections instead of a new handshake each time
+    self._http = httpx.Client(
+      base_url=f"{self.supabase_url}/rest/v1",
+      http2=True,
+      timeout=30,
+      limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+      headers={
+        "apikey": self.supabase_key,
+        "Authorization": f"Bearer {self.supabase_key}",
+        "Content-Type": "application/json",
+        "Prefer": "return=minimal",
+      },
+    )
+
+  def close(self):
+    """Close the pooled HTTP connections."""
+    self._http.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    self.close()
+
   def wait_for_db(self, max_attempts: int = 5):
     """
     Verify Supabase connection is working.
@@ -49,16 +281,44 @@ class SupabaseManager:
     """
     for attempt in range(max_attempts):
       try:
-        # Try a simple query to verify connection
-        self.client.table("entry_metadata").select("count", count="exact").limit(1).execute()
+        # Try a HEAD request to verify connection; no rows are sent and nothing is counted
+        self.client.table("entry_metadata").select("entry_id", head=True).limit(1).execute()
         return True
-      except Exception as e:
+      except (httpx.HTTPError, APIError) as e:
         logger.warning(f"Supabase connection attempt {attempt + 1}/{max_attempts} failed: {e}")
         if attempt == max_attempts - 1:
           logger.error(f"Failed to connect to Supabase: {e}")
           return False
+        # Exponential backoff with jitter, so a starting instance isn't hammered
+        time.sleep(min(30, 0.5 * 2**attempt) + random.uniform(0, 0.25))
     return False
 
+  @staticmethod
+  def is_unchanged(stored: Optional[Dict], content_hash: Optional[str]) -> bool:
+    """Check whether a row returned by get_http_validators has the given content_hash and both of its embeddings."""
+    return bool(content_hash and stored and stored.get("has_embeddings") and stored.get("content_hash") == content_hash)
+
+  def _is_unchanged(self, entry_id: str, content_hash: Optional[str]) -> bool:
+    """Check whether the stored entry has the given content_hash and both of its embeddings."""
+    if not content_hash:
+      return False
+
+    try:
+      # Narrow query: the embeddings are only tested for presence, never transferred
+      response = (
+        self.client
+        .table("entry_metadata")
+        .select("content_hash")
+        .eq("entry_id", entry_id)
+        .not_.is_("title_embedding", "null")
+        .not_.is_("content_embedding", "null")
+        .execute()
+      )
+      return bool(response.data) and response.data[0]["content_hash"] == content_hash
+    except Exception as e:
+      logger.warning(f"Could not check stored content hash of entry {entry_id}: {e}")
+      return False
+
   def save_entry(
     self,
     entry_id: str,
@@ -72,6 +332,10 @@ class SupabaseManager:
     markdown: str = None,
     toc: List[Dict[str, Any]] = None,
     authors: List[str] = None,
+    embeddings: Dict[str, Any] = None,
+    etag: str = None,
+    http_last_modified: str = None,
+    unchanged: bool = None,
   ) -> bool:
     """
     Save entry metadata and content to Supabase.
@@ -88,14 +352,17 @@ class SupabaseManager:
         markdown: Markdown content
         toc: Table of contents
         authors: List of authors
+        embeddings: Precomputed title/content embeddings; generated here when omitted
+        etag: ETag response header of the scraped page
+        http_last_modified: Last-Modified response header of the scraped page
+        unchanged: Whether the stored entry already has this content_hash and its embeddings;
+            checked here when omitted. Unchanged entries only get their metadata updated
 
     Returns:
         True if saved successfully, False otherwise
     """
     try:
-      # First, check if entry already exists
-      logger.info(f"Checking if entry {entry_id} exists in database")
-      response = self.client.table("entry_metadata").select("*").eq("entry_id", entry_id).execute()
+      now_iso = datetime.now().isoformat()
 
       # Prepare metadata
       metadata = {
@@ -106,53 +373,51 @@ class SupabaseManager:
         "preamble": preamble,
         "content_hash": content_hash,
         "authors": authors or [],
-        "updated_at": datetime.now().isoformat(),
+        "etag": etag,
+        "http_last_modified": http_last_modified,
+        "updated_at": now_iso,
       }
 
+      # Unchanged content needs neither new embeddings nor a content write
+      if unchanged is None:
+        unchanged = self._is_unchanged(entry_id, content_hash)
+      if unchanged:
+        logger.info(f"Content of entry {entry_id} is unchanged, updating metadata only")
+        self.client.table("entry_metadata").update(metadata, returning=ReturnMethod.minimal).eq("entry_id", entry_id).execute()
+        return True
+
       # Generate embeddings if enabled
-      if self.enable_embeddings and markdown and title:
+      if self.enable_embeddings and markdown and title and embeddings is None:
         logger.info(f"Generating embeddings for entry: {entry_id}")
         try:
           embeddings = generate_article_embeddings(title, markdown)
-          if "title_embedding" in embeddings:
-            metadata["title_embedding"] = embeddings["title_embedding"]
-          if "content_embedding" in embeddings:
-            metadata["content_embedding"] = embeddings["content_embedding"]
           logger.info(f"Successfully generated embeddings for entry: {entry_id}")
         except Exception as e:
           logger.error(f"Failed to generate embeddings for entry {entry_id}: {str(e)}")
           # Continue with save even if embeddings fail
 
+      if self.enable_embeddings and embeddings:
+        if "title_embedding" in embeddings:
+          metadata["title_embedding"] = _pgvector_literal(embeddings["title_embedding"])
+        if "content_embedding" in embeddings:
+          metadata["content_embedding"] = _pgvector_literal(embeddings["content_embedding"])
+
       # Prepare content
       content = {
         "entry_id": entry_id,
         "content": html,  # Store the HTML content
         "markdown": markdown,
         "toc": toc,
-        "updated_at": datetime.now().isoformat(),
+        "updated_at": now_iso,
       }
 
       # Log content details
       logger.info(f"Content data for {entry_id}: markdown length={len(markdown) if markdown else 0}, toc items={len(toc) if toc else 0}")
 
-      if len(response.data) > 0:
-        # Update existing entry
-        logger.info(f"Updating existing entry in entry_metadata table: {entry_id}")
-        metadata_response = self.client.table("entry_metadata").update(metadata).eq("entry_id", entry_id).execute()
-        logger.info(f"Metadata update response: {metadata_response.data}")
-
-        logger.info(f"Updating existing entry in entry_content table: {entry_id}")
-        content_response = self.client.table("entry_content").update(content).eq("entry_id", entry_id).execute()
-        logger.info(f"Content update response: {content_response.data}")
-      else:
-        # Insert new entry
-        logger.info(f"Inserting new entry in entry_metadata table: {entry_id}")
-        metadata_response = self.client.table("entry_metadata").insert(metadata).execute()
-        logger.info(f"Metadata insert response: {metadata_response.data}")
-
-        logger.info(f"Inserting new entry in entry_content table: {entry_id}")
-        content_response = self.client.table("entry_content").insert(content).execute()
-        logger.info(f"Content insert response: {content_response.data}")
+      # Insert or update both tables in one transaction and a single round trip
+      logger.info(f"Upserting entry: {entry_id}")
+      response = self.client.rpc("upsert_entry", {"metadata": metadata, "content": content}).execute()
+      logger.info(f"Upsert response: {response.data}")
 
       return True
     except Exception as e:
@@ -160,27 +425,154 @@ class SupabaseManager:
       logger.error(error_text)
       return False
 
-  def get_entry(self, entry_id: str) -> Dict:
+  async def save_entry_async(
+    self,
+    entry_id: str,
+    title: str,
+    markdown: str = None,
+    content_hash: str = None,
+    embeddings: Dict[str, Any] = None,
+    unchanged: bool = None,
+    **kwargs: Any,
+  ) -> bool:
+    """
+    Async version of save_entry.
+
+    Embeddings are generated with the async OpenAI client and the upsert runs in a worker thread,
+    so the event loop stays free while the entry is saved.
+
+    Args:
+        entry_id: Entry ID
+        title: Entry title
+        markdown: Markdown content
+        content_hash: Hash of entry content
+        embeddings: Precomputed title/content embeddings; generated here when omitted
+        unchanged: Whether the stored entry already has this content_hash and its embeddings;
+            checked here when omitted
+        **kwargs: Remaining save_entry arguments
+
+    Returns:
+        True if saved successfully, False otherwise
+    """
+    # Checked before generating embeddings, which an unchanged entry doesn't need
+    if unchanged is None:
+      unchanged = await asyncio.to_thread(self._is_unchanged, entry_id, content_hash)
+
+    if self.enable_embeddings and markdown and title and embeddings is None and not unchanged:
+      logger.info(f"Generating embeddings for entry: {entry_id}")
+      try:
+        embeddings = await agenerate_article_embeddings(title, markdown)
+      except Exception as e:
+        logger.error(f"Failed to generate embeddings for entry {entry_id}: {str(e)}")
+        # Continue with save even if embeddings fail
+        embeddings = {}
+
+    return await asyncio.to_thread(
+      self.save_entry,
+      entry_id=entry_id,
+      title=title,
+      markdown=markdown,
+      content_hash=content_hash,
+      embeddings=embeddings,
+      unchanged=unchanged,
+      **kwargs,
+    )
+
+  async def save_entries_batch(self, entries: List[Dict[str, Any]], concurrency: int = EMBEDDING_CONCURRENCY) -> List[bool]:
+    """
+    Save several entries concurrently.
+
+    Args:
+        entries: save_entry keyword arguments for each entry
+        concurrency: Maximum number of entries saved at the same time
+
+    Returns:
+        Whether each entry was saved successfully, in the same order as entries
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def save_one(entry: Dict[str, Any]) -> bool:
+      async with semaphore:
+        return await self.save_entry_async(**entry)
+
+    return await asyncio.gather(*[save_one(entry) for entry in entries])
+
+  def get_http_validators(self, entry_id: str) -> Optional[Dict]:
+    """
+    Get the HTTP validators stored by the previous scrape of an entry.
+
+    The same lookup returns what is_unchanged needs, so a scrape reads the stored row only once.
+
+    Args:
+        entry_id: Entry ID
+
+    Returns:
+        Dictionary with title, etag, http_last_modified, content_hash and has_embeddings,
+        or None if the entry is not stored
+    """
+    try:
+      response = (
+        self.client.table("entry_metadata").select("title, etag, http_last_modified, content_hash, has_embeddings").eq("entry_id", entry_id).execute()
+      )
+      return response.data[0] if response.data else None
+    except Exception as e:
+      logger.error(f"Error getting HTTP validators for entry {entry_id}: {e}")
+      return None
+
+  def get_entry_metadata(self, entry_id: str, include_embeddings: bool = False) -> Optional[Dict]:
+    """
+    Get the metadata of an entry.
+
+    Args:
+        entry_id: Entry ID
+        include_embeddings: Whether to include the title and content embeddings
+
+    Returns:
+        Entry metadata, or None if the entry is not stored
+    """
+    columns = METADATA_COLUMNS + (", title_embedding, content_embedding" if include_embeddings else "")
+    response = self.client.table("entry_metadata").select(columns).eq("entry_id", entry_id).execute()
+    return response.data[0] if response.data else None
+
+  def get_entry_content(self, entry_id: str, include_html: bool = False) -> Optional[Dict]:
+    """
+    Get the content of an entry.
+
+    Args:
+        entry_id: Entry ID
+        include_html: Whether to include the article HTML alongside the markdown and table of contents
+
+    Returns:
+        Entry content, or None if the entry has no stored content
+    """
+    columns = "entry_id, markdown, toc, updated_at" + (", content" if include_html else "")
+    response = self.client.table("entry_content").select(columns).eq("entry_id", entry_id).execute()
+    return response.data[0] if response.data else None
+
+  def get_entry(self, entry_id: str, include_content: bool = True, include_embeddings: bool = False) -> Dict:
     """
     Get entry by ID.
 
     Args:
         entry_id: Entry ID
+        include_content: Whether to include the entry's markdown and table of contents
+        include_embeddings: Whether to include the title and content embeddings
 
     Returns:
-        Entry data including metadata and content
+        Entry data including metadata and, if requested, content
     """
     try:
       # Get metadata
-      metadata = self.client.table("entry_metadata").select("*").eq("entry_id", entry_id).execute()
+      result = self.get_entry_metadata(entry_id, include_embeddings=include_embeddings)
+      if result is None or not include_content:
+        return result
 
       # Get content
-      content = self.client.table("entry_content").select("*").eq("entry_id", entry_id).execute()
+      content = self.get_entry_content(entry_id)
 
       # Merge data
-      if len(metadata.data) > 0 and len(content.data) > 0:
-        result = {**metadata.data[0]}
-        result["content"] = content.data[0]
+      if content is not None:
+        result["content"] = content
         return result
 
       return None
@@ -188,85 +580,98 @@ class SupabaseManager:
       logger.error(f"Error getting entry: {e}")
       return None
 
-  def list_entries(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+  def list_entries(self, limit: int = 100, offset: int = 0, cursor_updated_at: str = None, cursor_entry_id: str = None) -> Dict[str, Any]:
     """
-    List entries.
+    List entries, most recently scraped first.
+
+    Pass the next_cursor of the previous page as cursor_updated_at and cursor_entry_id to get the
+    next page. This keyset pagination reads only `limit` rows however deep the page is, and stays
+    stable while entries are being written.
 
     Args:
         limit: Maximum number of entries to return
-        offset: Offset for pagination
+        offset: Offset for pagination; deprecated, as deep offsets scan every skipped row.
+            Ignored when a cursor is given
+        cursor_updated_at: updated_at of the last entry of the previous page
+        cursor_entry_id: entry_id of the last entry of the previous page
 
     Returns:
-        List of entry metadata
+        Dictionary with the page of entry metadata and the next_cursor (None on the last page)
+
+    Raises:
+        ValueError: If the cursor is incomplete or malformed
     """
+    _validate_cursor(cursor_updated_at, cursor_entry_id)
     try:
-      response = self.client.table("entry_metadata").select("*").order("last_scraped", desc=True).range(offset, offset + limit - 1).execute()
+      query = self.client.table("entry_metadata").select(METADATA_COLUMNS).order("updated_at", desc=True).order("entry_id", desc=True)
 
-      return response.data
+      if cursor_updated_at is not None:
+        # Rows strictly after the cursor in (updated_at, entry_id) descending order
+        query = query.or_(f'updated_at.lt."{cursor_updated_at}",and(updated_at.eq."{cursor_updated_at}",entry_id.lt."{cursor_entry_id}")').limit(limit)
+      else:
+        query = query.range(offset, offset + limit - 1)
+
+      entries = query.execute().data
+      next_cursor = None
+      if len(entries) == limit:
+        next_cursor = {"updated_at": entries[-1]["updated_at"], "entry_id": entries[-1]["entry_id"]}
+
+      return {"entries": entries, "next_cursor": next_cursor}
     except Exception as e:
+      # Raised rather than returned as an empty page, which would look like the end of the list
       logger.error(f"Error listing entries: {e}")
-      return []
+      raise
 
   def search_by_text(self, query: str, limit: int = 10) -> List[Dict]:
     """
     Search entries by text.
 
+    Uses Postgres full-text search over titles, preambles and markdown, so queries support
+    web-search syntax ("quoted phrases", or, -excluded) and are answered from GIN indexes.
+
     Args:
         query: Search query
         limit: Maximum number of results
 
     Returns:
-        List of matching entries
+        List of matching entries, best matches first
     """
     try:
-      # Search for entries where title contains the query
-      response = (
-        self.client.table("entry_metadata").select("entry_id, title, url, date_modified, last_scraped").ilike("title", f"%{query}%").limit(limit).execute()
-      )
-
-      results = response.data
-
-      # If we got fewer than limit results, also search in the markdown content
-      if len(results) < limit:
-        remaining = limit - len(results)
-        # Get entry_ids from content where markdown contains query
-        content_response = self.client.table("entry_content").select("entry_id").ilike("markdown", f"%{query}%").limit(remaining).execute()
-
-        content_entry_ids = [item["entry_id"] for item in content_response.data]
-
-        # Exclude entry_ids already in results
-        existing_ids = [item["entry_id"] for item in results]
-        new_ids = [id for id in content_entry_ids if id not in existing_ids]
-
-        # If we have new IDs to fetch, get their metadata
-        if new_ids:
-          # Using "in" filter for multiple IDs
-          additional_entries = []
-          for entry_id in new_ids:
-            meta_response = (
-              self.client.table("entry_metadata").select("entry_id, title, url, date_modified, last_scraped").eq("entry_id", entry_id).execute()
-            )
-            if meta_response.data:
-              additional_entries.extend(meta_response.data)
-
-          # Combine results
-          results.extend(additional_entries)
-
-      return results
+      response = self.client.rpc("text_search", {"query": query, "match_count": limit}).execute()
+      return response.data
     except Exception as e:
       logger.error(f"Error searching entries: {e}")
       return []
 
-  def count_entries(self) -> int:
-    """Count total number of entries."""
+  def count_entries(self, raise_errors: bool = False) -> int:
+    """
+    Count total number of entries.
+
+    Args:
+        raise_errors: Re-raise query errors instead of returning 0, so callers caching the count don't cache a failure
+
+    Returns:
+        Number of entries, or 0 if the query failed and raise_errors is False
+    """
     try:
-      response = self.client.table("entry_metadata").select("count", count="exact").limit(1).execute()
+      # HEAD request: the count arrives in the Content-Range header, with no response body
+      response = self.client.table("entry_metadata").select("*", count=CountMethod.exact, head=True).execute()
       return response.count
     except Exception as e:
       logger.error(f"Error counting entries: {e}")
+      if raise_errors:
+        raise
       return 0
 
-  def vector_search(self, query: str, limit: int = 10, search_type: str = "content", similarity_threshold: float = 0.75) -> List[Dict]:
+  def vector_search(
+    self,
+    query: str,
+    limit: int = 10,
+    search_type: str = "content",
+    similarity_threshold: float = 0.75,
+    query_embedding: List[float] = None,
+    ef_search: int = 40,
+  ) -> List[Dict]:
     """
     Perform vector similarity search on articles.
 
@@ -275,27 +680,43 @@ class SupabaseManager:
         limit: Maximum number of results to return
         search_type: Type of search ('content' or 'title')
         similarity_threshold: Minimum similarity threshold (0-1)
+        query_embedding: Precomputed embedding of the query; generated here when omitted
+        ef_search: HNSW candidate list size; higher improves recall at the cost of latency (raised to limit if smaller)
 
     Returns:
         List of articles matching the query by semantic similarity
     """
     try:
-      from embeddings import generate_embedding
-
       # Generate embedding for the query
-      query_embedding = generate_embedding(query)
+      if query_embedding is None:
+        query_embedding = _query_embedding(query)
       if not query_embedding:
         logger.error("Failed to generate embedding for query")
         return []
 
+      # Near-duplicate queries with the same parameters are answered from the cache; the parameters
+      # come from clients, so they are matched per entry rather than each getting its own buffer
+      cache_params = (limit, similarity_threshold, ef_search)
+      cached_results = self.search_cache.get(search_type, query_embedding, cache_params)
+      if cached_results is not None:
+        logger.info(f"Semantic search cache hit for vector search query: {query}")
+        return cached_results
+
       # Execute vector search using the match_entries function
       rpc_response = self.client.rpc(
         "match_entries",
-        {"query_embedding": query_embedding, "similarity_threshold": similarity_threshold, "match_count": limit, "search_type": search_type},
+        {
+          "query_embedding": _pgvector_literal(query_embedding),
+          "similarity_threshold": similarity_threshold,
+          "match_count": limit,
+          "search_type": search_type,
+          "ef_search": ef_search,
+        },
       ).execute()
 
       if rpc_response.data:
         logger.info(f"Vector search found {len(rpc_response.data)} results")
+        self.search_cache.set(search_type, query_embedding, rpc_response.data, cache_params)
         return rpc_response.data
 
       # If no results, log and return empty list
@@ -307,81 +728,135 @@ class SupabaseManager:
       logger.error(error_text)
       return []
 
-  def regenerate_embeddings(self, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+  def _get_entries_for_embedding(self, limit: int, offset: int, force: bool = False) -> List[Dict]:
+    """Get the entries (entry_id, title) to regenerate embeddings for; unless forced, only those missing an embedding."""
+    query = self.client.table("entry_metadata").select("entry_id, title")
+    if not force:
+      query = query.or_("title_embedding.is.null,content_embedding.is.null")
+    entries_response = query.order("updated_at", desc=True).range(offset, offset + limit - 1).execute()
+    return entries_response.data
+
+  def _get_markdowns(self, entry_ids: List[str]) -> Dict[str, str]:
+    """Get the markdown content of several entries in one query, keyed by entry_id; entries without markdown are left out."""
+    if not entry_ids:
+      return {}
+
+    content_response = self.client.table("entry_content").select("entry_id, markdown").in_("entry_id", entry_ids).execute()
+    markdowns = {row["entry_id"]: row["markdown"] for row in content_response.data if row.get("markdown")}
+
+    for entry_id in entry_ids:
+      if entry_id not in markdowns:
+        logger.warning(f"No markdown content for entry: {entry_id}")
+
+    return markdowns
+
+  def _embedding_rows(self, entries: List[Dict], embeddings: List[Dict[str, Any]]) -> List[Dict]:
+    """Build entry_metadata rows for the entries whose title and content embeddings were both generated."""
+    rows = []
+    for entry, entry_embeddings in zip(entries, embeddings):
+      if "title_embedding" not in entry_embeddings or "content_embedding" not in entry_embeddings:
+        logger.error(f"Failed to generate embeddings for entry: {entry['entry_id']}")
+        continue
+      rows.append({
+        "entry_id": entry["entry_id"],
+        # title is NOT NULL, so it is needed for the row to pass the insert half of the upsert
+        "title": entry["title"],
+        "title_embedding": _pgvector_literal(entry_embeddings["title_embedding"]),
+        "content_embedding": _pgvector_literal(entry_embeddings["content_embedding"]),
+      })
+    return rows
+
+  def _upsert_embeddings(self, rows: List[Dict]) -> int:
+    """Store embeddings of several entries with one bulk upsert per UPSERT_BATCH_SIZE rows, returning the number of entries updated."""
+    updated = 0
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+      batch = rows[start : start + UPSERT_BATCH_SIZE]
+      try:
+        # Only the row count comes back, not the rows with their embeddings
+        upsert_response = (
+          self.client.table("entry_metadata").upsert(batch, on_conflict="entry_id", returning=ReturnMethod.minimal, count=CountMethod.exact).execute()
+        )
+        updated += upsert_response.count or 0
+      except Exception as e:
+        logger.error(f"Failed to update embeddings for {len(batch)} entries: {str(e)}")
+
+    logger.info(f"Successfully updated embeddings for {updated} entries")
+    return updated
+
+  def regenerate_embeddings(self, limit: int = 10, offset: int = 0, force: bool = False) -> Dict[str, Any]:
     """
     Regenerate embeddings for entries in the database.
     Useful for updating existing entries after adding vector search capabilities.
 
+    Markdown is fetched in one query, all entries are embedded with batched API calls and
+    the results are written back with a single bulk upsert.
+
     Args:
         limit: Maximum number of entries to process
-        offset: Offset for pagination
+        offset: Offset for pagination. Unless forced, it counts only entries still missing an
+            embedding, which drop out of that set once processed; so repeat with offset 0 until
+            total_processed is 0, raising offset by failure_count to skip entries that keep failing
+        force: Re-embed entries that already have embeddings, e.g. after changing the model;
+            otherwise only entries missing an embedding are processed
 
     Returns:
         Dictionary with success count and failure count
     """
+    entries = []
     success_count = 0
-    failure_count = 0
 
     try:
-      # Get entries without embeddings or process all entries
-      entries_response = (
-        self.client.table("entry_metadata").select("entry_id, title").order("updated_at", desc=True).range(offset, offset + limit - 1).execute()
-      )
-
-      entries = entries_response.data
+      entries = self._get_entries_for_embedding(limit, offset, force)
       logger.info(f"Found {len(entries)} entries to process")
 
-      for entry in entries:
-        entry_id = entry["entry_id"]
-        title = entry["title"]
+      markdowns = self._get_markdowns([entry["entry_id"] for entry in entries])
+      to_embed = [entry for entry in entries if entry["entry_id"] in markdowns]
+
+      embeddings = generate_article_embeddings_batch([entry["title"] for entry in to_embed], [markdowns[entry["entry_id"]] for entry in to_embed])
+      success_count = self._upsert_embeddings(self._embedding_rows(to_embed, embeddings))
 
-        # Get content for this entry
-        content_response = self.client.table("entry_content").select("markdown").eq("entry_id", entry_id).execute()
+      return {"success_count": success_count, "failure_count": len(entries) - success_count, "total_processed": len(entries)}
+    except Exception as e:
+      error_text = f"Error regenerating embeddings: {str(e)}\n{traceback.format_exc()}"
+      logger.error(error_text)
+      return {"success_count": success_count, "failure_count": len(entries) - success_count, "error": str(e)}
 
-        if not content_response.data:
-          logger.warning(f"No content found for entry: {entry_id}")
-          failure_count += 1
-          continue
+  async def aregenerate_embeddings(self, limit: int = 10, offset: int = 0, force: bool = False) -> Dict[str, Any]:
+    """
+    Regenerate embeddings for entries without blocking the event loop.
 
-        markdown = content_response.data[0].get("markdown")
-        if not markdown:
-          logger.warning(f"No markdown content for entry: {entry_id}")
-          failure_count += 1
-          continue
+    Async version of regenerate_embeddings: the embedding batches are awaited concurrently,
+    and the blocking Supabase calls run in worker threads.
 
-        # Generate embeddings
-        try:
-          embeddings = generate_article_embeddings(title, markdown)
-          if not embeddings:
-            logger.error(f"Failed to generate embeddings for entry: {entry_id}")
-            failure_count += 1
-            continue
-
-          # Update the metadata record with embeddings
-          update_data = {}
-          if "title_embedding" in embeddings:
-            update_data["title_embedding"] = embeddings["title_embedding"]
-          if "content_embedding" in embeddings:
-            update_data["content_embedding"] = embeddings["content_embedding"]
-
-          if update_data:
-            update_response = self.client.table("entry_metadata").update(update_data).eq("entry_id", entry_id).execute()
-
-            if update_response.data:
-              logger.info(f"Successfully updated embeddings for entry: {entry_id}")
-              success_count += 1
-            else:
-              logger.error(f"Failed to update embeddings for entry: {entry_id}")
-              failure_count += 1
-        except Exception as e:
-          logger.error(f"Error processing entry {entry_id}: {str(e)}")
-          failure_count += 1
+    Args:
+        limit: Maximum number of entries to process
+        offset: Offset for pagination. Unless forced, it counts only entries still missing an
+            embedding, which drop out of that set once processed; so repeat with offset 0 until
+            total_processed is 0, raising offset by failure_count to skip entries that keep failing
+        force: Re-embed entries that already have embeddings, e.g. after changing the model;
+            otherwise only entries missing an embedding are processed
+
+    Returns:
+        Dictionary with success count and failure count
+    """
+    entries = []
+    success_count = 0
+
+    try:
+      entries = await asyncio.to_thread(self._get_entries_for_embedding, limit, offset, force)
+      logger.info(f"Found {len(entries)} entries to process")
 
-      return {"success_count": success_count, "failure_count": failure_count, "total_processed": len(entries)}
+      markdowns = await asyncio.to_thread(self._get_markdowns, [entry["entry_id"] for entry in entries])
+      to_embed = [entry for entry in entries if entry["entry_id"] in markdowns]
+
+      embeddings = await agenerate_article_embeddings_batch([entry["title"] for entry in to_embed], [markdowns[entry["entry_id"]] for entry in to_embed])
+      success_count = await asyncio.to_thread(self._upsert_embeddings, self._embedding_rows(to_embed, embeddings))
+
+      return {"success_count": success_count, "failure_count": len(entries) - success_count, "total_processed": len(entries)}
     except Exception as e:
       error_text = f"Error regenerating embeddings: {str(e)}\n{traceback.format_exc()}"
       logger.error(error_text)
-      return {"success_count": success_count, "failure_count": failure_count, "error": str(e)}
+      return {"success_count": success_count, "failure_count": len(entries) - success_count, "error": str(e)}
 
   def execute_sql(self, sql: str) -> bool:
     """
@@ -396,26 +871,43 @@ class SupabaseManager:
     try:
       # For executing SQL, we need to use the Supabase REST API directly
       # by making a POST request to the SQL endpoint
-      headers = {
-        "apikey": self.supabase_key,
-        "Authorization": f"Bearer {self.supabase_key}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-      }
+      response = self._http.post("/rpc/exec", json={"query": sql})
 
-      url = f"{self.supabase_url}/rest/v1/rpc/exec"
+      if response.status_code < 300:
+        logger.info(f"SQL executed successfully: {sql[:50]}...")
+        return True
+      else:
+        logger.error(f"Error executing SQL: {response.status_code} - {response.text}")
+        return False
 
-      # Create a client with proper SSL verification
-      with httpx.Client(verify=True) as client:
-        response = client.post(url, headers=headers, json={"query": sql})
+    except Exception as e:
+      logger.error(f"Error executing SQL: {str(e)}")
+      return False
 
-        if response.status_code < 300:
-          logger.info(f"SQL executed successfully: {sql[:50]}...")
-          return True
-        else:
-          logger.error(f"Error executing SQL: {response.status_code} - {response.text}")
-          return False
+  def execute_sql_many(self, statements: List[str]) -> Optional[List[int]]:
+    """
+    Execute several SQL statements in one request and one transaction.
+
+    The statements run without waiting for a synchronous commit, which suits bulk maintenance
+    such as migrations; if one fails, none of them are applied. Only the service role may call
+    exec_many, so the manager must be created with the service role key.
+
+    Args:
+        statements: SQL statements to execute, in order
+
+    Returns:
+        Number of rows affected by each statement, or None if execution failed
+    """
+    try:
+      response = self._http.post("/rpc/exec_many", json={"queries": statements}, headers={"Prefer": "return=representation"})
+
+      if response.status_code < 300:
+        logger.info(f"Executed {len(statements)} SQL statements successfully")
+        return response.json()
+      else:
+        logger.error(f"Error executing SQL: {response.status_code} - {response.text}")
+        return None
 
     except Exception as e:
       logger.error(f"Error executing SQL: {str(e)}")
-      return False
+      return None
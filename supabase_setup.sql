@@ -12,10 +12,35 @@ CREATE TABLE IF NOT EXISTS entry_metadata (
     content_hash TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
-    title_embedding VECTOR(1536),
-    content_embedding VECTOR(1536)
+    title_embedding HALFVEC(1536),
+    content_embedding HALFVEC(1536),
+    etag TEXT,
+    http_last_modified TEXT
 );
 
+-- HTTP validators for conditional re-scrapes (for tables created before these columns existed)
+ALTER TABLE entry_metadata ADD COLUMN IF NOT EXISTS etag TEXT;
+ALTER TABLE entry_metadata ADD COLUMN IF NOT EXISTS http_last_modified TEXT;
+
+-- Computed column for PostgREST: whether an entry has both embeddings, selectable without transferring them
+CREATE OR REPLACE FUNCTION has_embeddings(entry_metadata) RETURNS BOOLEAN AS $$
+    SELECT $1.title_embedding IS NOT NULL AND $1.content_embedding IS NOT NULL;
+$$ LANGUAGE sql STABLE;
+
+-- Store embeddings as half precision (for tables created with VECTOR columns)
+DO $$
+BEGIN
+    IF (SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+        WHERE attrelid = 'entry_metadata'::regclass AND attname = 'content_embedding') <> 'halfvec(1536)' THEN
+        DROP INDEX IF EXISTS entry_metadata_content_embedding_idx;
+        DROP INDEX IF EXISTS entry_metadata_title_embedding_idx;
+        ALTER TABLE entry_metadata
+            ALTER COLUMN title_embedding TYPE HALFVEC(1536) USING title_embedding::HALFVEC(1536),
+            ALTER COLUMN content_embedding TYPE HALFVEC(1536) USING content_embedding::HALFVEC(1536);
+    END IF;
+END;
+$$;
+
 -- Create the entry_content table if it doesn't exist
 CREATE TABLE IF NOT EXISTS entry_content (
     entry_id TEXT PRIMARY KEY REFERENCES entry_metadata(entry_id) ON DELETE CASCADE,
@@ -27,11 +52,14 @@ CREATE TABLE IF NOT EXISTS entry_content (
 );
 
 -- Create function for vector similarity search
+DROP FUNCTION IF EXISTS match_entries(VECTOR, FLOAT, INT, TEXT);
+DROP FUNCTION IF EXISTS match_entries(HALFVEC, FLOAT, INT, TEXT);
 CREATE OR REPLACE FUNCTION match_entries(
-    query_embedding VECTOR(1536),
+    query_embedding HALFVEC(1536),
     similarity_threshold FLOAT DEFAULT 0.75,
     match_count INT DEFAULT 10,
-    search_type TEXT DEFAULT 'content'
+    search_type TEXT DEFAULT 'content',
+    ef_search INT DEFAULT 40
 ) RETURNS TABLE (
     entry_id TEXT,
     title TEXT,
@@ -42,6 +70,10 @@ CREATE OR REPLACE FUNCTION match_entries(
     published TIMESTAMP WITH TIME ZONE
 ) LANGUAGE plpgsql AS $$
 BEGIN
+    -- Size of the HNSW candidate list for this transaction only (recall vs. latency);
+    -- the index returns at most ef_search rows, so it must cover match_count
+    PERFORM set_config('hnsw.ef_search', GREATEST(ef_search, match_count)::TEXT, true);
+
     IF search_type = 'content' THEN
         RETURN QUERY
         SELECT
@@ -58,7 +90,7 @@ BEGIN
             e.content_embedding IS NOT NULL
             AND 1 - (e.content_embedding <=> query_embedding) > similarity_threshold
         ORDER BY
-            similarity DESC
+            e.content_embedding <=> query_embedding
         LIMIT match_count;
     ELSE
         RETURN QUERY
@@ -76,15 +108,112 @@ BEGIN
             e.title_embedding IS NOT NULL
             AND 1 - (e.title_embedding <=> query_embedding) > similarity_threshold
         ORDER BY
-            similarity DESC
+            e.title_embedding <=> query_embedding
         LIMIT match_count;
     END IF;
 END;
 $$;
 
--- Create indexes for faster vector searches
-CREATE INDEX IF NOT EXISTS entry_metadata_content_embedding_idx ON entry_metadata USING ivfflat (content_embedding vector_cosine_ops) WITH (lists = 100);
-CREATE INDEX IF NOT EXISTS entry_metadata_title_embedding_idx ON entry_metadata USING ivfflat (title_embedding vector_cosine_ops) WITH (lists = 100);
+-- Create HNSW indexes for faster vector searches (requires pgvector >= 0.5), replacing the old IVFFLAT ones
+DROP INDEX IF EXISTS entry_metadata_content_embedding_idx;
+DROP INDEX IF EXISTS entry_metadata_title_embedding_idx;
+CREATE INDEX IF NOT EXISTS entry_metadata_content_embedding_hnsw_idx ON entry_metadata USING hnsw (content_embedding halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+CREATE INDEX IF NOT EXISTS entry_metadata_title_embedding_hnsw_idx ON entry_metadata USING hnsw (title_embedding halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);
+
+-- Create index for keyset pagination of entry listings (most recently scraped first)
+CREATE INDEX IF NOT EXISTS entry_metadata_updated_at_idx ON entry_metadata (updated_at DESC, entry_id DESC);
+
+-- Full-text search vectors, generated so they always match the stored text (title weighted above preamble)
+ALTER TABLE entry_metadata ADD COLUMN IF NOT EXISTS search_vec TSVECTOR
+    GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(preamble, '')), 'B')) STORED;
+ALTER TABLE entry_content ADD COLUMN IF NOT EXISTS search_vec TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(markdown, ''))) STORED;
+
+-- Create indexes for full-text search
+CREATE INDEX IF NOT EXISTS entry_metadata_search_vec_idx ON entry_metadata USING GIN (search_vec);
+CREATE INDEX IF NOT EXISTS entry_content_search_vec_idx ON entry_content USING GIN (search_vec);
+
+-- Create function for full-text search over titles, preambles and article text
+CREATE OR REPLACE FUNCTION text_search(
+    query TEXT,
+    match_count INT DEFAULT 10
+) RETURNS TABLE (
+    entry_id TEXT,
+    title TEXT,
+    rank REAL,
+    preamble TEXT,
+    authors TEXT[],
+    last_updated TIMESTAMP WITH TIME ZONE,
+    published TIMESTAMP WITH TIME ZONE
+) LANGUAGE sql STABLE AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('english', query) AS tsq
+    ),
+    -- Each branch can use its own GIN index
+    matches AS (
+        SELECT m.entry_id FROM entry_metadata m, q WHERE m.search_vec @@ q.tsq
+        UNION
+        SELECT c.entry_id FROM entry_content c, q WHERE c.search_vec @@ q.tsq
+    )
+    SELECT
+        m.entry_id,
+        m.title,
+        ts_rank(m.search_vec, q.tsq) + coalesce(ts_rank(c.search_vec, q.tsq), 0) AS rank,
+        m.preamble,
+        m.authors,
+        m.last_updated,
+        m.published
+    FROM
+        matches
+        JOIN entry_metadata m ON m.entry_id = matches.entry_id
+        LEFT JOIN entry_content c ON c.entry_id = matches.entry_id,
+        q
+    ORDER BY
+        rank DESC
+    LIMIT match_count;
+$$;
+
+-- Create function to insert or update an entry's metadata and content in a single transaction
+CREATE OR REPLACE FUNCTION upsert_entry(metadata JSONB, content JSONB)
+RETURNS TEXT LANGUAGE plpgsql AS $$
+DECLARE
+    saved_entry_id TEXT;
+BEGIN
+    INSERT INTO entry_metadata AS e (
+        entry_id, title, last_updated, published, preamble, authors, content_hash,
+        etag, http_last_modified, updated_at, title_embedding, content_embedding
+    )
+    SELECT
+        m.entry_id, m.title, m.last_updated, m.published, m.preamble, COALESCE(m.authors, '{}'), m.content_hash,
+        m.etag, m.http_last_modified, COALESCE(m.updated_at, now()), m.title_embedding, m.content_embedding
+    FROM jsonb_populate_record(NULL::entry_metadata, metadata) m
+    ON CONFLICT (entry_id) DO UPDATE SET
+        title = EXCLUDED.title,
+        last_updated = EXCLUDED.last_updated,
+        published = EXCLUDED.published,
+        preamble = EXCLUDED.preamble,
+        authors = EXCLUDED.authors,
+        content_hash = EXCLUDED.content_hash,
+        etag = EXCLUDED.etag,
+        http_last_modified = EXCLUDED.http_last_modified,
+        updated_at = EXCLUDED.updated_at,
+        -- Keep stored embeddings when none were generated for this save
+        title_embedding = COALESCE(EXCLUDED.title_embedding, e.title_embedding),
+        content_embedding = COALESCE(EXCLUDED.content_embedding, e.content_embedding)
+    RETURNING e.entry_id INTO saved_entry_id;
+
+    INSERT INTO entry_content AS c (entry_id, content, markdown, toc, updated_at)
+    SELECT saved_entry_id, m.content, m.markdown, m.toc, COALESCE(m.updated_at, now())
+    FROM jsonb_populate_record(NULL::entry_content, content) m
+    ON CONFLICT (entry_id) DO UPDATE SET
+        content = EXCLUDED.content,
+        markdown = EXCLUDED.markdown,
+        toc = EXCLUDED.toc,
+        updated_at = EXCLUDED.updated_at;
+
+    RETURN saved_entry_id;
+END;
+$$;
 
 -- Create a function to execute SQL from the REST API (if needed)
 CREATE OR REPLACE FUNCTION exec(query text)
@@ -92,4 +221,26 @@ RETURNS VOID AS $$
 BEGIN
     EXECUTE query;
 END;
-$$ LANGUAGE plpgsql SECURITY DEFINER; 
\ No newline at end of file
+$$ LANGUAGE plpgsql SECURITY DEFINER; 
+-- Create a function to execute several SQL statements from the REST API in one transaction
+CREATE OR REPLACE FUNCTION exec_many(queries text[])
+RETURNS INT[] AS $$
+DECLARE
+    query text;
+    affected INT;
+    row_counts INT[] := '{}';
+BEGIN
+    -- Meant for bulk maintenance: don't wait for the WAL flush when the transaction commits
+    SET LOCAL synchronous_commit = OFF;
+    FOREACH query IN ARRAY queries LOOP
+        EXECUTE query;
+        GET DIAGNOSTICS affected = ROW_COUNT;
+        row_counts := row_counts || affected;
+    END LOOP;
+    RETURN row_counts;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- exec_many runs arbitrary SQL as its owner: only the service role may call it
+REVOKE EXECUTE ON FUNCTION exec_many(text[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION exec_many(text[]) TO service_role;